@@ -1,15 +1,51 @@
-from django.contrib import admin
+import json
 
-# Register your models here.
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Attendance, Task, Rating
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import Attendance, Rating, Task, User
+
+
+class EstimatedCountPaginator(Paginator):
+    # COUNT(*) over a few hundred thousand rows takes seconds on Postgres, so
+    # past ADMIN_EXACT_COUNT_LIMIT the planner's row estimate is shown instead
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        # counting a LIMITed subquery stays cheap however big the table is
+        capped = queryset.order_by()[:limit + 1].count()
+        if capped <= limit:
+            return capped
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return max(int(plan[0]['Plan']['Plan Rows']), capped)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # skip the second, unfiltered COUNT(*) behind "N total"
+    show_full_result_count = False
 
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'role', 'supervisor', 'is_staff', 'is_active')
     list_filter = ('role', 'is_staff', 'is_active')
+    list_select_related = ('supervisor',)
+    autocomplete_fields = ('supervisor',)
     fieldsets = UserAdmin.fieldsets + (
         ('Custom Fields', {'fields': ('role', 'supervisor')}),
     )
@@ -18,6 +54,28 @@ class CustomUserAdmin(UserAdmin):
     )
 
 
-admin.site.register(Attendance)
-admin.site.register(Task)
-admin.site.register(Rating)
\ No newline at end of file
+@admin.register(Attendance)
+class AttendanceAdmin(LargeTableAdmin):
+    list_display = ('employee', 'date', 'clock_in', 'clock_out')
+    list_select_related = ('employee',)
+    autocomplete_fields = ('employee',)
+    date_hierarchy = 'date'
+
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    list_display = ('title', 'employee', 'status', 'priority', 'deadline', 'created_at')
+    list_select_related = ('employee',)
+    list_filter = ('status',)
+    autocomplete_fields = ('employee', 'created_by')
+    date_hierarchy = 'created_at'
+
+
+@admin.register(Rating)
+class RatingAdmin(LargeTableAdmin):
+    list_display = ('task', 'rated_by', 'rating', 'created_at')
+    list_select_related = ('task__employee', 'rated_by')
+    list_filter = ('rating',)
+    autocomplete_fields = ('rated_by',)
+    raw_id_fields = ('task',)
+    date_hierarchy = 'created_at'
@@ -0,0 +1,121 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Attendance, User
+
+# Local append-only journal for clock-in/out events when
+# ATTENDANCE_WRITE_BEHIND is on. Requests only touch this file; the
+# drain_attendance_queue command applies events to the main database in
+# batches. One event per (kind, employee, date) is kept, and applying an
+# event is idempotent, so a crash between the two commits never double-applies.
+
+CLOCK_IN = 'clock_in'
+CLOCK_OUT = 'clock_out'
+
+_local = threading.local()
+
+
+def _connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(str(settings.ATTENDANCE_JOURNAL_PATH), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " employee_id INTEGER NOT NULL,"
+            " date TEXT NOT NULL,"
+            " at TEXT NOT NULL,"
+            " drained INTEGER NOT NULL DEFAULT 0,"
+            " UNIQUE (kind, employee_id, date))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS events_pending ON events (drained, seq)")
+        _local.conn = conn
+    return conn
+
+
+def enabled():
+    return getattr(settings, 'ATTENDANCE_WRITE_BEHIND', False)
+
+
+def record(kind, employee_id, at):
+    # returns False if this employee already has this event for the day
+    cursor = _connection().execute(
+        "INSERT OR IGNORE INTO events (kind, employee_id, date, at) VALUES (?, ?, ?, ?)",
+        (kind, employee_id, at.date().isoformat(), at.isoformat()),
+    )
+    return cursor.rowcount == 1
+
+
+def event_time(kind, employee_id, day):
+    row = _connection().execute(
+        "SELECT at FROM events WHERE kind = ? AND employee_id = ? AND date = ?",
+        (kind, employee_id, day.isoformat()),
+    ).fetchone()
+    return datetime.fromisoformat(row[0]) if row else None
+
+
+def pending_count():
+    return _connection().execute("SELECT COUNT(*) FROM events WHERE drained = 0").fetchone()[0]
+
+
+def drain(batch_size=500):
+    conn = _connection()
+    rows = conn.execute(
+        "SELECT seq, kind, employee_id, date, at FROM events WHERE drained = 0 ORDER BY seq LIMIT ?",
+        (batch_size,),
+    ).fetchall()
+    if not rows:
+        return 0
+
+    clock_ins = []
+    clock_outs = {}
+    for seq, kind, employee_id, _, at in rows:
+        at = datetime.fromisoformat(at)
+        if kind == CLOCK_IN:
+            clock_ins.append(Attendance(employee_id=employee_id, date=at.date(), clock_in=at))
+        else:
+            clock_outs[(employee_id, at.date())] = at
+
+    # employees deleted since their event was journaled are dropped
+    supervisors = dict(User.objects.filter(id__in={row[2] for row in rows}).values_list('id', 'supervisor_id'))
+    clock_ins = [attendance for attendance in clock_ins if attendance.employee_id in supervisors]
+    for attendance in clock_ins:
+        attendance.team_supervisor_id = supervisors[attendance.employee_id]
+
+    with transaction.atomic():
+        # clock-ins first so a clock-out in the same batch finds its row
+        Attendance.objects.bulk_create(clock_ins, ignore_conflicts=True)
+
+        if clock_outs:
+            open_rows = Attendance.objects.filter(
+                employee_id__in={employee_id for employee_id, _ in clock_outs},
+                date__in={day for _, day in clock_outs},
+                clock_out__isnull=True,
+            )
+            updated = []
+            now = timezone.now()
+            for attendance in open_rows:
+                at = clock_outs.get((attendance.employee_id, attendance.date))
+                if at is not None and at >= attendance.clock_in:
+                    attendance.clock_out = at
+                    attendance.updated_at = now
+                    updated.append(attendance)
+            Attendance.objects.bulk_update(updated, ['clock_out', 'updated_at'], batch_size=batch_size)
+
+    conn.executemany("UPDATE events SET drained = 1 WHERE seq = ?", [(row[0],) for row in rows])
+    return len(rows)
+
+
+def prune(before):
+    # drained events are kept for the day so repeat taps are still rejected
+    conn = _connection()
+    cursor = conn.execute("DELETE FROM events WHERE drained = 1 AND date < ?", (before.isoformat(),))
+    return cursor.rowcount
@@ -0,0 +1,215 @@
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import EventCursor, Rating, RatingStat
+from .task_events import COMMIT_LAG
+
+# Supervisor rating calibration. RatingStat keeps count, sum, sum of squares
+# and a score histogram per (employee, supervisor) pair; consume() folds new
+# ratings into it, forget() takes deleted ones back out, and calibration() turns that pair table into each
+# supervisor's distribution and z-score-normalised employee scores with NumPy.
+# Results are cached per cursor version, so they are recomputed only after a
+# new batch of ratings has been folded in.
+
+CURSOR_NAME = 'rating_calibration'
+CACHE_TIMEOUT = 60 * 60 * 24
+SCORES = np.arange(1, 6)
+STAT_FIELDS = ['count', 'total', 'total_squares', 'histogram']
+
+
+def _locked_cursor():
+    cursor, _ = EventCursor.objects.get_or_create(name=CURSOR_NAME)
+    # lock the cursor row so concurrent consumers can't apply a batch twice
+    return EventCursor.objects.select_for_update().get(pk=cursor.pk)
+
+
+def _aggregate(rows):
+    # rows are (employee, rated_by, rating); group all of them by pair at once
+    rows = np.array(rows, dtype=np.int64).reshape(-1, 3)
+    pairs, groups = np.unique(rows[:, :2], axis=0, return_inverse=True)
+    groups = groups.ravel()
+    histogram = np.bincount(groups * 5 + rows[:, 2] - 1, minlength=len(pairs) * 5).reshape(-1, 5)
+    return {
+        (employee_id, rater_id): RatingStat(
+            employee_id=employee_id, rated_by_id=rater_id,
+            count=count, total=total, total_squares=squares, histogram=buckets,
+        )
+        for (employee_id, rater_id), count, total, squares, buckets in zip(
+            pairs.tolist(),
+            histogram.sum(axis=1).tolist(),
+            (histogram @ SCORES).tolist(),
+            (histogram @ SCORES ** 2).tolist(),
+            histogram.tolist(),
+        )
+    }
+
+
+def _ratings():
+    # ratings whose supervisor was deleted can't be calibrated
+    return Rating.objects.filter(rated_by__isnull=False, created_at__lt=timezone.now() - COMMIT_LAG)
+
+
+def rebuild():
+    with transaction.atomic():
+        cursor = _locked_cursor()
+        ratings = _ratings()
+        last = ratings.aggregate(last=Max('id'))['last'] or 0
+        stats = _aggregate(list(
+            ratings.filter(id__lte=last).order_by().values_list('task__employee_id', 'rated_by_id', 'rating')
+        ))
+        RatingStat.objects.all().delete()
+        RatingStat.objects.bulk_create(stats.values(), batch_size=1000)
+        cursor.position = last
+        cursor.save(update_fields=['position', 'updated_at'])
+    return len(stats)
+
+
+def consume(batch_size=1000):
+    with transaction.atomic():
+        cursor = _locked_cursor()
+        ratings = list(
+            _ratings().filter(id__gt=cursor.position)
+            .order_by('id')
+            .values_list('id', 'task__employee_id', 'rated_by_id', 'rating')[:batch_size]
+        )
+        if not ratings:
+            return 0
+
+        batch = _aggregate([rating[1:] for rating in ratings])
+        lookup = Q()
+        for employee_id, rater_id in batch:
+            lookup |= Q(employee_id=employee_id, rated_by_id=rater_id)
+        stats = {(s.employee_id, s.rated_by_id): s for s in RatingStat.objects.filter(lookup)}
+
+        for key, delta in batch.items():
+            stat = stats.get(key)
+            if stat is None:
+                continue
+            stat.count += delta.count
+            stat.total += delta.total
+            stat.total_squares += delta.total_squares
+            stat.histogram = [a + b for a, b in zip(stat.histogram, delta.histogram)]
+
+        RatingStat.objects.bulk_create([delta for key, delta in batch.items() if key not in stats])
+        RatingStat.objects.bulk_update(stats.values(), STAT_FIELDS)
+        cursor.position = ratings[-1][0]
+        cursor.save(update_fields=['position', 'updated_at'])
+    return len(ratings)
+
+
+def forget(rating, employee_id):
+    # a deleted rating that was already folded in comes back out of its pair,
+    # so the stats stay right without a --rebuild; later ones were never added
+    if rating.rated_by_id is None or employee_id is None:
+        return
+    with transaction.atomic():
+        cursor = _locked_cursor()
+        if rating.pk > cursor.position:
+            return
+        stat = RatingStat.objects.select_for_update().filter(employee_id=employee_id, rated_by_id=rating.rated_by_id).first()
+        if stat is None:
+            return
+        if stat.count <= 1:
+            stat.delete()
+        else:
+            stat.count -= 1
+            stat.total -= rating.rating
+            stat.total_squares -= rating.rating ** 2
+            stat.histogram[rating.rating - 1] -= 1
+            stat.save(update_fields=STAT_FIELDS)
+        # a new cursor version, so the cached calibration is recomputed
+        cursor.save(update_fields=['updated_at'])
+
+
+def _compute():
+    rows = list(RatingStat.objects.order_by().values_list('employee_id', 'rated_by_id', *STAT_FIELDS))
+    if not rows:
+        return {'ratings': 0, 'mean': None, 'std': None, 'supervisors': [], 'employees': []}
+
+    data = np.array([row[:5] for row in rows], dtype=np.float64)
+    histograms = np.array([row[5] for row in rows], dtype=np.int64)
+    count, total, squares = data[:, 2], data[:, 3], data[:, 4]
+
+    ratings = count.sum()
+    mean = total.sum() / ratings
+    std = np.sqrt(max(squares.sum() / ratings - mean ** 2, 0.0))
+
+    rater_ids, raters = np.unique(data[:, 1].astype(np.int64), return_inverse=True)
+    rater_count = np.bincount(raters, weights=count)
+    rater_mean = np.bincount(raters, weights=total) / rater_count
+    rater_variance = np.maximum(np.bincount(raters, weights=squares) / rater_count - rater_mean ** 2, 0.0)
+    rater_std = np.sqrt(rater_variance)
+    rater_histogram = np.stack(
+        [np.bincount(raters, weights=histograms[:, k], minlength=len(rater_ids)) for k in range(5)], axis=1,
+    ).astype(np.int64)
+
+    # sum over a pair's ratings of (rating - rater mean) / rater std; a
+    # supervisor who gives everyone the same score carries no signal, so 0
+    scale = np.where(rater_std > 0, rater_std, np.inf)
+    z_sums = (total - count * rater_mean[raters]) / scale[raters]
+
+    employee_ids, employees = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+    employee_count = np.bincount(employees, weights=count)
+    raw_mean = np.bincount(employees, weights=total) / employee_count
+    z_scores = np.bincount(employees, weights=z_sums) / employee_count
+    # back onto the 1-5 scale using the org-wide distribution
+    calibrated = mean + z_scores * std
+
+    return {
+        'ratings': int(ratings),
+        'mean': round(float(mean), 2),
+        'std': round(float(std), 2),
+        'supervisors': [
+            {
+                'id': id,
+                'ratings': int(n),
+                'mean': average,
+                'variance': variance,
+                'std': spread,
+                'leniency': leniency,
+                'distribution': dict(zip(map(str, SCORES.tolist()), buckets)),
+            }
+            for id, n, average, variance, spread, leniency, buckets in zip(
+                rater_ids.tolist(),
+                rater_count.tolist(),
+                np.round(rater_mean, 2).tolist(),
+                np.round(rater_variance, 2).tolist(),
+                np.round(rater_std, 2).tolist(),
+                np.round(rater_mean - mean, 2).tolist(),
+                rater_histogram.tolist(),
+            )
+        ],
+        'employees': [
+            {
+                'id': id,
+                'ratings': int(n),
+                'raters': rated_by,
+                'raw_mean': raw,
+                'z_score': z,
+                'calibrated_score': score,
+            }
+            for id, n, rated_by, raw, z, score in zip(
+                employee_ids.tolist(),
+                employee_count.tolist(),
+                np.bincount(employees).tolist(),
+                np.round(raw_mean, 2).tolist(),
+                np.round(z_scores, 3).tolist(),
+                np.round(calibrated, 2).tolist(),
+            )
+        ],
+    }
+
+
+def calibration():
+    # the cursor changes whenever stats do, so it doubles as the cache version
+    cursor = EventCursor.objects.filter(name=CURSOR_NAME).first()
+    version = f"{cursor.position}:{cursor.updated_at.timestamp()}" if cursor else 'empty'
+    key = f"rating-calibration:{version}"
+    result = cache.get(key)
+    if result is None:
+        result = _compute()
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,139 @@
+import bisect
+from datetime import timedelta
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import DeadlineBucket, Task
+from .workload import OPEN_STATUSES
+
+# Deadline horizon, so "due soon" questions don't scan the task table:
+#
+#   buckets   DeadlineBucket rows count one employee's open tasks per deadline
+#             date. A task save/delete recounts just its old and new bucket
+#             after commit; the nightly sweep rebuilds them all. Team and
+#             org-wide due/overdue counts and calendars are range lookups on
+#             these rows.
+#   lists     each employee's open tasks with a deadline, sorted by deadline,
+#             cached and dropped whenever one of them changes. Their own
+#             window ("due in the next N days") is a bisection of that list.
+
+# bounds how long a list filled just before an invalidation can stay stale
+LIST_TIMEOUT = 60 * 15
+
+
+def open_tasks():
+    return Task.objects.filter(status__in=OPEN_STATUSES, deadline__isnull=False)
+
+
+def _pairs_lookup(pairs):
+    lookup = Q()
+    for employee_id, deadline in pairs:
+        lookup |= Q(employee_id=employee_id, deadline=deadline)
+    return lookup
+
+
+def refresh(pairs):
+    # recount the given (employee_id, deadline) buckets
+    pairs = {(employee_id, deadline) for employee_id, deadline in pairs if employee_id and deadline}
+    if not pairs:
+        return
+    counts = {
+        (employee_id, deadline): count
+        for employee_id, deadline, count in open_tasks().filter(_pairs_lookup(pairs)).order_by()
+        .values('employee_id', 'deadline').annotate(count=Count('pk')).values_list('employee_id', 'deadline', 'count')
+    }
+    with transaction.atomic():
+        empty = pairs - counts.keys()
+        if empty:
+            DeadlineBucket.objects.filter(_pairs_lookup(empty)).delete()
+        DeadlineBucket.objects.bulk_create(
+            [DeadlineBucket(employee_id=e, deadline=d, open_count=count) for (e, d), count in counts.items()],
+            update_conflicts=True,
+            unique_fields=['employee', 'deadline'],
+            update_fields=['open_count'],
+        )
+
+
+def rebuild(batch_size=1000):
+    rows = open_tasks().order_by().values('employee_id', 'deadline').annotate(count=Count('pk'))
+    with transaction.atomic():
+        DeadlineBucket.objects.all().delete()
+        created = DeadlineBucket.objects.bulk_create(
+            [DeadlineBucket(employee_id=row['employee_id'], deadline=row['deadline'], open_count=row['count']) for row in rows],
+            batch_size=batch_size,
+        )
+    return len(created)
+
+
+def task_changed(task, deleted=False):
+    # a moved deadline or reassignment changes two buckets and two lists;
+    # edits that can't open, close or move the task (a new title) only the lists.
+    # The keys are bound to this write's own on_commit, so another thread's
+    # commit never recounts them before this one is visible
+    old = (getattr(task, '_loaded_employee_id', task.employee_id), getattr(task, '_loaded_deadline', task.deadline))
+    new = (task.employee_id, task.deadline)
+    pairs = {old, new} if deleted or old != new or getattr(task, '_loaded_status', None) != task.status else set()
+    employee_ids = {e for e in (old[0], new[0]) if e}
+    transaction.on_commit(lambda: flush(pairs, employee_ids))
+
+
+def flush(pairs, employee_ids):
+    refresh(pairs)
+    if employee_ids:
+        cache.delete_many([list_key(employee_id) for employee_id in employee_ids])
+
+
+def list_key(employee_id):
+    return f"deadlines:{employee_id}"
+
+
+def upcoming(employee_id):
+    # the employee's open tasks with a deadline, soonest first
+    key = list_key(employee_id)
+    entries = cache.get(key)
+    if entries is None:
+        entries = list(
+            open_tasks().filter(employee_id=employee_id).order_by('deadline', 'id')
+            .values('id', 'title', 'priority', 'deadline')
+        )
+        cache.set(key, entries, LIST_TIMEOUT)
+    return entries
+
+
+def between(entries, start, end):
+    # entries due from start to end inclusive; either may be None for open-ended
+    deadline = itemgetter('deadline')
+    lo = 0 if start is None else bisect.bisect_left(entries, start, key=deadline)
+    hi = len(entries) if end is None else bisect.bisect_right(entries, end, key=deadline)
+    return entries[lo:hi]
+
+
+def list_summary(entries, today, days, start, end):
+    calendar = {}
+    for entry in between(entries, start, end):
+        calendar[entry['deadline']] = calendar.get(entry['deadline'], 0) + 1
+    return {
+        "overdue_count": len(between(entries, None, today - timedelta(days=1))),
+        "due_count": len(between(entries, today, today + timedelta(days=days))),
+        "calendar": [{"date": day, "count": count} for day, count in calendar.items()],
+    }
+
+
+def bucket_summary(employees, today, days, start, end):
+    # employees: an id queryset to scope to, or None for everyone
+    buckets = DeadlineBucket.objects.all()
+    if employees is not None:
+        buckets = buckets.filter(employee_id__in=employees)
+    totals = buckets.aggregate(
+        overdue_count=Coalesce(Sum('open_count', filter=Q(deadline__lt=today)), 0),
+        due_count=Coalesce(Sum('open_count', filter=Q(deadline__gte=today, deadline__lte=today + timedelta(days=days))), 0),
+    )
+    calendar = (
+        buckets.filter(deadline__gte=start, deadline__lte=end).order_by('deadline')
+        .values('deadline').annotate(count=Sum('open_count')).values_list('deadline', 'count')
+    )
+    return {**totals, "calendar": [{"date": day, "count": count} for day, count in calendar]}
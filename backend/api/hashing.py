@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from .throttling import Overloaded
+
+# Password hashing with a per-process bound. Hashes run inline on the
+# request thread (the threaded gunicorn workers in gunicorn.conf.py); PBKDF2
+# and scrypt (hashlib) and Argon2 (argon2-cffi) release the GIL while they
+# work, so the other threads keep serving. Two semaphores do the bounding: at
+# most PASSWORD_HASH_WORKERS hashes run at once, up to PASSWORD_HASH_QUEUE
+# more wait their turn, and a request that can't get in within
+# PASSWORD_HASH_TIMEOUT seconds gets a 503 instead of piling more work onto
+# saturated cores. gunicorn.conf.py sizes the threads above these slots, so
+# logins can never hold every thread.
+
+
+class HashPool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.slots = None
+        self.running = None
+        self.stats = {}
+
+    def _ensure(self):
+        # semaphores held at fork time stay held in the child, so every worker
+        # process starts its own
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            workers = settings.PASSWORD_HASH_WORKERS
+            self.slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASH_QUEUE)
+            self.running = threading.BoundedSemaphore(workers)
+            self.stats = {'hashed': 0, 'rejected': 0, 'hash_seconds': 0.0, 'max_hash_seconds': 0.0, 'wait_seconds': 0.0}
+            self.pid = os.getpid()
+
+    def run(self, fn, *args):
+        self._ensure()
+        if not self.slots.acquire(timeout=settings.PASSWORD_HASH_TIMEOUT):
+            with self.lock:
+                self.stats['rejected'] += 1
+            raise Overloaded(max(1, round(settings.PASSWORD_HASH_TIMEOUT)))
+        try:
+            admitted = time.perf_counter()
+            with self.running:
+                started = time.perf_counter()
+                try:
+                    return fn(*args)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    with self.lock:
+                        self.stats['hashed'] += 1
+                        self.stats['hash_seconds'] += elapsed
+                        self.stats['max_hash_seconds'] = max(self.stats['max_hash_seconds'], elapsed)
+                        self.stats['wait_seconds'] += started - admitted
+        finally:
+            self.slots.release()
+
+    def snapshot(self):
+        self._ensure()
+        with self.lock:
+            stats = dict(self.stats)
+        hashed = stats.pop('hashed')
+        return {
+            "pid": self.pid,
+            "workers": settings.PASSWORD_HASH_WORKERS,
+            "queue": settings.PASSWORD_HASH_QUEUE,
+            "hasher": hashers.get_hasher().algorithm,
+            "hashed": hashed,
+            "rejected": stats['rejected'],
+            "avg_hash_ms": round(stats['hash_seconds'] / hashed * 1000, 2) if hashed else 0,
+            "max_hash_ms": round(stats['max_hash_seconds'] * 1000, 2),
+            "avg_wait_ms": round(stats['wait_seconds'] / hashed * 1000, 2) if hashed else 0,
+        }
+
+
+pool = HashPool()
+
+
+def make_password(raw_password):
+    return pool.run(hashers.make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    # (correct, must_update); must_update means a different preferred hasher
+    # or work factor, so the caller can rehash
+    return pool.run(hashers.verify_password, raw_password, encoded)
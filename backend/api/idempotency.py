@@ -0,0 +1,109 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+# Idempotency-Key support for API POST/PATCH. The first response for a key is
+# stored in the cache for IDEMPOTENCY_TTL seconds and replayed as-is on
+# retries, without running the view again. A duplicate that arrives while the
+# first request is still running waits for it behind a cache lock. Keys are
+# scoped to the JWT user (or shared by anonymous callers) and bound to the
+# method, path and body they were first used with.
+
+METHODS = ('POST', 'PATCH')
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+REPLAY_HEADER = 'Idempotent-Replayed'
+# recomputed, or added by middleware further out, on every response
+SKIPPED_HEADERS = {'content-length', 'content-encoding'}
+# rejections that would come out the same on a retry; 401, 408, 409, 429 and
+# server errors may well succeed later, so they're never stored
+DETERMINISTIC_ERRORS = {400, 403, 404, 405, 410, 413, 415, 422}
+
+
+def _scope(request):
+    # same user id DRF will authenticate, without the user lookup
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if not header:
+        return 'anon'
+    if len(header) != 2:
+        return None
+    try:
+        token = JWTAuthentication().get_validated_token(header[1].encode())
+    except (InvalidToken, TokenError):
+        return None
+    return f"user:{token.get(jwt_settings.USER_ID_CLAIM)}"
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return JsonResponse(
+            {"detail": "This Idempotency-Key was already used for a different request."},
+            status=422,
+        )
+    response = HttpResponse(stored['content'], status=stored['status'])
+    for name, value in stored['headers']:
+        response.headers[name] = value
+    response.headers[REPLAY_HEADER] = 'true'
+    return response
+
+
+class IdempotencyMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if not key or request.method not in METHODS or not request.path.startswith('/api/'):
+            return self.get_response(request)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({"detail": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters."}, status=400)
+
+        scope = _scope(request)
+        if scope is None:
+            # bad credentials: let authentication reject it, nothing to store
+            return self.get_response(request)
+
+        digest = hashlib.sha256(f"{scope}:{key}".encode()).hexdigest()
+        cache_key, lock_key = f"idempotency:{digest}", f"idempotency-lock:{digest}"
+        fingerprint = hashlib.sha256(
+            b'\n'.join([request.method.encode(), request.get_full_path().encode(), request.body])
+        ).hexdigest()
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+        while not cache.add(lock_key, True, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+            if time.monotonic() >= deadline:
+                response = JsonResponse(
+                    {"detail": "A request with this Idempotency-Key is still in progress."},
+                    status=409,
+                )
+                response.headers['Retry-After'] = '1'
+                return response
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            # the first request may have finished just before we took the lock
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            response = self.get_response(request)
+            stored_status = 200 <= response.status_code < 300 or response.status_code in DETERMINISTIC_ERRORS
+            if stored_status and not response.streaming:
+                cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'headers': [(name, value) for name, value in response.items() if name.lower() not in SKIPPED_HEADERS],
+                    'content': response.content,
+                }, settings.IDEMPOTENCY_TTL)
+            return response
+        finally:
+            cache.delete(lock_key)
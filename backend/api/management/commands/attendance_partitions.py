@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from api import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage monthly partitions of the attendance table (PostgreSQL): convert the table once "
+        "with --convert, then run daily to create upcoming partitions and detach expired ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--convert', action='store_true', help="Turn the existing table into a partitioned one")
+        parser.add_argument('--months-ahead', type=int, default=settings.ATTENDANCE_PARTITION_MONTHS_AHEAD)
+        parser.add_argument(
+            '--retain-months', type=int, default=settings.ATTENDANCE_PARTITION_RETAIN_MONTHS,
+            help="Detach partitions wholly older than this many months (0 keeps everything)",
+        )
+        parser.add_argument('--drop', action='store_true', help="Drop detached partitions instead of archiving them")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError("Attendance partitioning needs PostgreSQL.")
+
+        if options['convert']:
+            if partitions.is_partitioned(connection):
+                raise CommandError("The attendance table is already partitioned.")
+            boundary, created = partitions.convert(connection, options['months_ahead'])
+            self.stdout.write(f"Partitioned the attendance table; rows before {boundary} are in {partitions.LEGACY}")
+        elif not partitions.is_partitioned(connection):
+            raise CommandError("The attendance table isn't partitioned yet; run with --convert first.")
+        else:
+            created = partitions.ensure_partitions(connection, options['months_ahead'])
+
+        for name in created:
+            self.stdout.write(f"Created {name}")
+
+        if options['retain_months']:
+            schema = None if options['drop'] else settings.ATTENDANCE_ARCHIVE_SCHEMA
+            for name in partitions.detach_old(connection, options['retain_months'], schema):
+                self.stdout.write(f"Dropped {name}" if schema is None else f"Moved {name} to {schema}")
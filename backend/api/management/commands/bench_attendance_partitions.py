@@ -0,0 +1,123 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from api.partitions import add_months, month_start
+
+PLAIN = 'bench_attendance_plain'
+PARTITIONED = 'bench_attendance_partitioned'
+COLUMNS = (
+    "id bigint NOT NULL, employee_id bigint NOT NULL, team_supervisor_id bigint, "
+    "date date NOT NULL, clock_in timestamptz NOT NULL, clock_out timestamptz, updated_at timestamptz NOT NULL"
+)
+# the attendance table's own indexes
+INDEXES = (
+    "(employee_id, date)",
+    "(team_supervisor_id, date DESC)",
+    "(date DESC, clock_in DESC)",
+    "(updated_at)",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Build scratch copies of an attendance-shaped table, plain and monthly-partitioned, "
+        "and compare recent-window queries on both (PostgreSQL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--rows', type=int, default=50_000_000)
+        parser.add_argument('--days', type=int, default=5 * 365, help="History the rows are spread over")
+        parser.add_argument('--teams', type=int, default=500)
+        parser.add_argument('--runs', type=int, default=20, help="Timed runs per query")
+        parser.add_argument('--reuse', action='store_true', help="Query tables left by an earlier --keep run")
+        parser.add_argument('--keep', action='store_true', help="Leave the scratch tables in place")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError("The partitioning benchmark needs PostgreSQL.")
+
+        today = timezone.now().date()
+        first = today - timedelta(days=options['days'] - 1)
+        try:
+            with connection.cursor() as cursor:
+                if not options['reuse']:
+                    self.build(cursor, options['rows'], options['days'], options['teams'], first, today)
+                self.compare(cursor, options['runs'], options['teams'], today)
+        finally:
+            if not options['keep']:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {PLAIN}, {PARTITIONED}")
+
+    def build(self, cursor, rows, days, teams, first, today):
+        started = time.perf_counter()
+        cursor.execute(f"DROP TABLE IF EXISTS {PLAIN}, {PARTITIONED}")
+        cursor.execute(f"CREATE TABLE {PLAIN} ({COLUMNS}, PRIMARY KEY (id))")
+        cursor.execute(f"CREATE TABLE {PARTITIONED} ({COLUMNS}, UNIQUE (id, date)) PARTITION BY RANGE (date)")
+        month = month_start(first)
+        while month <= today:
+            following = add_months(month, 1)
+            cursor.execute(
+                f"CREATE TABLE {PARTITIONED}_p{month:%Y_%m} PARTITION OF {PARTITIONED} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+            )
+            month = following
+
+        # one row per employee per day, newest days last like real inserts
+        employees = max(rows // days, 1)
+        cursor.execute(
+            f"INSERT INTO {PLAIN} "
+            "SELECT g, g %% %s, (g %% %s) %% %s, %s::date + (g / %s)::int, "
+            "(%s::date + (g / %s)::int) + time '09:00' + (g %% 600) * interval '1 second', "
+            "(%s::date + (g / %s)::int) + time '17:00', now() "
+            "FROM generate_series(0, %s - 1) g",
+            [employees, employees, teams, first, employees, first, employees, first, employees, rows],
+        )
+        cursor.execute(f"INSERT INTO {PARTITIONED} SELECT * FROM {PLAIN}")
+        for table in (PLAIN, PARTITIONED):
+            for number, columns in enumerate(INDEXES):
+                cursor.execute(f"CREATE INDEX {table}_{number} ON {table} {columns}")
+            cursor.execute(f"ANALYZE {table}")
+        self.stdout.write(f"Loaded {rows:,} rows into both tables in {time.perf_counter() - started:.0f}s")
+
+    def compare(self, cursor, runs, teams, today):
+        week, month = today - timedelta(days=6), today - timedelta(days=29)
+        queries = [
+            ("count last 7 days", "SELECT COUNT(*) FROM {table} WHERE date >= %s", [week]),
+            ("team page, last 30 days",
+             "SELECT * FROM {table} WHERE team_supervisor_id = %s AND date >= %s ORDER BY date DESC LIMIT 50",
+             [teams // 2, month]),
+            ("late arrivals last 30 days",
+             "SELECT employee_id, COUNT(*) FROM {table} WHERE date >= %s AND clock_in::time > '09:05' GROUP BY employee_id",
+             [month]),
+            ("newest page", "SELECT * FROM {table} ORDER BY date DESC, clock_in DESC LIMIT 50", []),
+        ]
+        for table in (PLAIN, PARTITIONED):
+            cursor.execute(
+                "SELECT pg_size_pretty(SUM(pg_total_relation_size(c.oid))) FROM pg_class c "
+                "WHERE c.oid = to_regclass(%s) OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))",
+                [table, table],
+            )
+            self.stdout.write(f"{table}: {cursor.fetchone()[0]} with indexes")
+
+        self.stdout.write(f"{'query':<30}{'plain ms':>24}{'partitioned ms':>24}")
+        for label, sql, params in queries:
+            cells = []
+            for table in (PLAIN, PARTITIONED):
+                statement = sql.format(table=table)
+                cursor.execute(statement, params)
+                cursor.fetchall()  # warm up
+                timings = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    cursor.execute(statement, params)
+                    cursor.fetchall()
+                    timings.append((time.perf_counter() - start) * 1000)
+                cells.append(f"{statistics.median(timings):.2f} (p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.2f})")
+            self.stdout.write(f"{label:<30}{cells[0]:>24}{cells[1]:>24}")
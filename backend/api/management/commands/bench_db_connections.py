@@ -0,0 +1,80 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate concurrent requests against a database alias and report latency and "
+        "connection setups. Compare DB_POOL=True against DB_POOL=False --cold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=50, help="Requests per thread")
+        parser.add_argument('--cold', action='store_true', help="Close the connection after every request (CONN_MAX_AGE=0)")
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['requests'] < 1:
+            raise CommandError("--threads and --requests must be at least 1.")
+        alias = options['database']
+        latencies = []
+        created = []
+        lock = threading.Lock()
+
+        def on_created(sender, connection, **kwargs):
+            if connection.alias == alias:
+                with lock:
+                    created.append(1)
+
+        def worker():
+            local = []
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                with connections[alias].cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                # what request_finished does at the end of every request
+                if options['cold']:
+                    connections[alias].close()
+                else:
+                    close_old_connections()
+                local.append((time.perf_counter() - start) * 1000)
+            connections[alias].close()
+            with lock:
+                latencies.extend(local)
+
+        connection_created.connect(on_created)
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        connection_created.disconnect(on_created)
+
+        latencies.sort()
+        # quantiles() needs two samples; with one, it is its own p99
+        p99 = statistics.quantiles(latencies, n=100, method='inclusive')[98] if len(latencies) > 1 else latencies[-1]
+        pool = getattr(connections[alias], 'pool', None)
+        stats = pool.get_stats() if pool is not None else {}
+
+        self.stdout.write(f"mode: {'pool' if pool is not None else 'no pool'}{' (cold)' if options['cold'] else ''}")
+        self.stdout.write(f"requests: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f} req/s)")
+        self.stdout.write(
+            f"latency ms: p50={statistics.median(latencies):.2f} "
+            f"p99={p99:.2f} max={latencies[-1]:.2f}"
+        )
+        # with a pool, connection_created fires on every checkout; count physical connections instead
+        self.stdout.write(f"connection setups: {stats.get('connections_num', len(created))}")
+        if stats:
+            self.stdout.write(
+                f"pool wait ms: total={stats.get('requests_wait_ms', 0)} "
+                f"waiting_requests={stats.get('requests_queued', 0)}"
+            )
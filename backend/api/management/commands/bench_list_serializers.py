@@ -0,0 +1,84 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Attendance, Task, User
+from api.projections import ATTENDANCE_PROJECTION, TASK_PROJECTION
+from api.renderers import ORJSONRenderer
+from api.serializers import AttendanceSerializer, TaskSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/sec of the ModelSerializer + JSONRenderer list path against the "
+        "values() projection + orjson path. Sample rows are created and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['rows'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, rows):
+        self.stdout.write(f"seeding {rows} tasks and attendance rows...")
+        employees_count = max(rows // 100, 1)
+        supervisor = User.objects.create(username='bench-supervisor', role='supervisor')
+        employees = User.objects.bulk_create([
+            User(username=f'bench-employee-{i}', role='employee', supervisor=supervisor)
+            for i in range(employees_count)
+        ])
+        now = timezone.now()
+        Task.objects.bulk_create([
+            Task(
+                title=f'task {i}', employee=employees[i % employees_count], created_by=supervisor,
+                deadline=now.date(), completed_at=now if i % 2 else None,
+                status='completed' if i % 2 else 'in_progress', team_supervisor=supervisor,
+            )
+            for i in range(rows)
+        ], batch_size=5000)
+        Attendance.objects.bulk_create([
+            Attendance(
+                employee=employees[i % employees_count], date=(now - timedelta(days=i // employees_count)).date(),
+                clock_in=now - timedelta(days=i // employees_count, hours=8),
+                clock_out=now - timedelta(days=i // employees_count), team_supervisor=supervisor,
+            )
+            for i in range(rows)
+        ], batch_size=5000)
+
+        tasks = Task.objects.filter(team_supervisor=supervisor)
+        attendances = Attendance.objects.filter(team_supervisor=supervisor)
+        for name, queryset, serializer_class, projection in [
+            ('tasks', tasks, TaskSerializer, TASK_PROJECTION),
+            ('attendance', attendances, AttendanceSerializer, ATTENDANCE_PROJECTION),
+        ]:
+            # select_related keeps the serializer path free of per-row queries,
+            # so the comparison measures serialization cost only
+            serializer_seconds = self.time(lambda: JSONRenderer().render(
+                serializer_class(queryset.select_related('employee', 'created_by') if name == 'tasks'
+                                 else queryset.select_related('employee'), many=True).data
+            ))
+            projection_seconds = self.time(lambda: ORJSONRenderer().render(projection.rows(queryset)))
+            self.stdout.write(
+                f"{name}: serializer {rows / serializer_seconds:,.0f} rows/s, "
+                f"projection {rows / projection_seconds:,.0f} rows/s "
+                f"({serializer_seconds / projection_seconds:.1f}x)"
+            )
+
+    def time(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
@@ -0,0 +1,118 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# runs in a fresh interpreter per sample: load the WSGI app the way gunicorn
+# does, serve one request, then a second one once everything is warm
+WORKER = """
+import io, json, sys, time
+started = time.perf_counter()
+from core.wsgi import application
+loaded = time.perf_counter()
+
+def request():
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http', 'wsgi.multithread': False, 'wsgi.multiprocess': True,
+        'wsgi.run_once': False, 'wsgi.version': (1, 0),
+    }
+    statuses = []
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(response)
+    response.close()
+    return statuses[0]
+
+status = request()
+first = time.perf_counter()
+request()
+second = time.perf_counter()
+
+rss = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1])
+print(json.dumps({
+    'status': status,
+    'load_ms': (loaded - started) * 1000,
+    'first_request_ms': (first - loaded) * 1000,
+    'warm_request_ms': (second - first) * 1000,
+    'rss_mb': rss / 1024,
+    'modules': len(sys.modules),
+}))
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare worker startup across settings profiles: import time (-X importtime), "
+        "time to the first request and RSS per worker, as medians over fresh interpreters."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', default=['core.settings', 'core.settings_api'])
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--path', default='/api/tasks/', help="Request path; unauthenticated, so expect a 401")
+        parser.add_argument('--top', type=int, default=10, help="Slowest packages to list per profile")
+
+    def run(self, profile, *args):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': profile}
+        return subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+
+    def import_times(self, profile, path):
+        # microseconds spent importing each top-level package, up to and
+        # including the first request (which imports the URLconf and views)
+        output = self.run(profile, '-X', 'importtime', '-c', WORKER, path).stderr
+        totals = {}
+        for self_us, cumulative_us, module in IMPORT_LINE.findall(output):
+            package = module.split('.')[0]
+            totals[package] = totals.get(package, 0) + int(self_us)
+        return totals
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in options['profiles']:
+            samples, imports = [], []
+            for _ in range(options['runs']):
+                imports.append(self.import_times(profile, options['path']))
+                started = time.perf_counter()
+                sample = json.loads(self.run(profile, '-c', WORKER, options['path']).stdout)
+                # interpreter startup, imports, setup and the first response
+                sample['process_ms'] = (time.perf_counter() - started) * 1000
+                samples.append(sample)
+            results[profile] = samples
+
+            self.stdout.write(f"{profile} (status {samples[0]['status']}, {samples[0]['modules']} modules)")
+            self.stdout.write(f"  import ms:         {statistics.median(sum(run.values()) for run in imports) / 1000:.1f}")
+            for field, label in (
+                ('load_ms', 'app load ms:     '),
+                ('first_request_ms', 'first request ms:'),
+                ('warm_request_ms', 'warm request ms: '),
+                ('process_ms', 'to first byte ms:'),
+                ('rss_mb', 'RSS MB:          '),
+            ):
+                self.stdout.write(f"  {label}  {statistics.median(sample[field] for sample in samples):.1f}")
+            slowest = sorted(imports[-1].items(), key=lambda item: item[1], reverse=True)[:options['top']]
+            self.stdout.write("  slowest packages (import ms): " + ", ".join(f"{module} {us / 1000:.0f}" for module, us in slowest))
+
+        if len(results) > 1:
+            baseline, *others = results
+            for profile in others:
+                self.stdout.write(f"{profile} vs {baseline}:")
+                for field in ('load_ms', 'first_request_ms', 'rss_mb'):
+                    before = statistics.median(sample[field] for sample in results[baseline])
+                    after = statistics.median(sample[field] for sample in results[profile])
+                    self.stdout.write(f"  {field}: {after - before:+.1f} ({(after - before) / before * 100:+.0f}%)")
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import calibration
+
+
+class Command(BaseCommand):
+    help = "Fold new ratings into the per-supervisor calibration statistics"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when there is nothing to consume")
+        parser.add_argument('--once', action='store_true', help="Consume what is pending and exit")
+        parser.add_argument('--rebuild', action='store_true', help="Recompute every statistic from all ratings first")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            pairs = calibration.rebuild()
+            self.stdout.write(f"Rebuilt calibration statistics for {pairs} employee/supervisor pairs")
+
+        while True:
+            consumed = calibration.consume(options['batch_size'])
+            if consumed:
+                self.stdout.write(f"Consumed {consumed} ratings")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
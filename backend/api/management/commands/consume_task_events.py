@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import task_events
+
+
+class Command(BaseCommand):
+    help = "Fold new task status events into the per-employee status counters and histograms"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when there is nothing to consume")
+        parser.add_argument('--once', action='store_true', help="Consume what is pending and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            consumed = task_events.consume(options['batch_size'])
+            if consumed:
+                self.stdout.write(f"Consumed {consumed} task events")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import attendance_queue
+
+
+class Command(BaseCommand):
+    help = "Apply journaled clock-in/clock-out events to the database in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the journal is empty")
+        parser.add_argument('--once', action='store_true', help="Drain what is pending and exit")
+        parser.add_argument('--keep-days', type=int, default=2, help="Days of drained events kept for duplicate detection")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        while True:
+            drained = attendance_queue.drain(batch_size)
+            if drained:
+                self.stdout.write(f"Applied {drained} attendance events")
+                continue
+
+            attendance_queue.prune(timezone.now().date() - timedelta(days=options['keep_days']))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
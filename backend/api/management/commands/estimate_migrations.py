@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.exceptions import AmbiguityError
+from django.db.migrations.executor import MigrationExecutor
+
+from api.online_migrations import AddIndexOnline, BackfillRows, RemoveIndexOnline, estimate
+
+ONLINE_OPERATIONS = (AddIndexOnline, BackfillRows, RemoveIndexOnline)
+
+
+def _seconds(value):
+    return "?" if value is None else f"{value:.1f}s"
+
+
+class Command(BaseCommand):
+    help = (
+        "Dry run: for each unapplied migration, report the rows every operation touches, "
+        "the lock it takes and roughly how long writes would be blocked. Nothing is changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('app_label', nargs='?')
+        parser.add_argument('migration_name', nargs='?', help="Estimate up to this migration")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--rows-per-second', type=float, default=100000,
+            help="Rows scanned/written per second on this database; measure it on a staging copy",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        executor = MigrationExecutor(connection)
+        loader = executor.loader
+        if options['migration_name']:
+            try:
+                migration = loader.get_migration_by_prefix(options['app_label'], options['migration_name'])
+            except (AmbiguityError, KeyError) as exc:
+                raise CommandError(str(exc))
+            targets = [(migration.app_label, migration.name)]
+        elif options['app_label']:
+            targets = [key for key in loader.graph.leaf_nodes() if key[0] == options['app_label']]
+        else:
+            targets = loader.graph.leaf_nodes()
+
+        plan = [migration for migration, backwards in executor.migration_plan(targets) if not backwards]
+        if not plan:
+            self.stdout.write("No unapplied migrations.")
+            return
+
+        rate = options['rows_per_second']
+        for migration in plan:
+            state = loader.project_state((migration.app_label, migration.name), at_end=False)
+            atomic = migration.atomic and connection.features.can_rollback_ddl
+            self.stdout.write(f"{migration.app_label}.{migration.name}{' (one transaction)' if atomic else ''}")
+            blocked = []
+            for operation in migration.operations:
+                before = state.clone()
+                operation.state_forwards(migration.app_label, state)
+                result = estimate(operation, migration.app_label, before, state, connection, rate)
+                if result is None:
+                    self.stdout.write(f"  {operation.describe()}: new table, no existing rows")
+                    continue
+                rows = "?" if result['rows'] is None else f"{result['rows']:,}"
+                self.stdout.write(
+                    f"  {operation.describe()}: {rows} rows, {result['lock']}, "
+                    f"writes blocked {_seconds(result['blocking'])}, runs {_seconds(result['duration'])}"
+                )
+                if migration.atomic and isinstance(operation, ONLINE_OPERATIONS):
+                    self.stdout.write(self.style.ERROR("    needs `atomic = False` on the migration"))
+                blocked.append(result['blocking'])
+
+            if atomic and blocked:
+                # inside one transaction every lock is held until the commit
+                total = None if None in blocked else sum(blocked)
+                self.stdout.write(f"  locks held until commit: up to {_seconds(total)}")
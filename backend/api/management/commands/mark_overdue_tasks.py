@@ -0,0 +1,25 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from api import deadlines, task_events
+from api.reports import org_changed
+
+
+class Command(BaseCommand):
+    help = "Nightly sweep: mark unfinished tasks past their deadline as overdue and rebuild the deadline buckets"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--warm', action='store_true', help="Warm the dashboard cache once the sweep is done")
+
+    def handle(self, *args, **options):
+        updated = task_events.mark_overdue(options['batch_size'])
+        self.stdout.write(f"Marked {updated} tasks overdue")
+        # also corrects any drift from bulk updates that bypass Task.save()
+        buckets = deadlines.rebuild(options['batch_size'])
+        self.stdout.write(f"Rebuilt {buckets} deadline buckets")
+        if updated:
+            # the sweep is a plain UPDATE, so retire every cached dashboard
+            org_changed()
+        if options['warm']:
+            call_command('warm_dashboard_cache', stdout=self.stdout, stderr=self.stderr)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import sync
+
+
+class Command(BaseCommand):
+    help = "Nightly: delete sync tombstones older than SYNC_TOMBSTONE_DAYS"
+
+    def handle(self, *args, **options):
+        deleted = sync.prune()
+        self.stdout.write(f"Deleted {deleted} tombstones")
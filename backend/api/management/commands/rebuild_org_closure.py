@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.models import OrgClosure
+
+
+class Command(BaseCommand):
+    help = "Rebuild the org hierarchy closure table from User.supervisor"
+
+    def handle(self, *args, **options):
+        rows = OrgClosure.objects.rebuild()
+        self.stdout.write(f"Rebuilt org closure with {rows} paths")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import warming
+
+
+class Command(BaseCommand):
+    help = "Precompute supervisor and admin dashboard data into the cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: one per CPU)")
+        parser.add_argument('--every', type=float, default=None, help="Keep running, warming again every N seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            result = warming.warm(options['processes'])
+            self.stdout.write(
+                f"Warmed {result['warmed']}/{result['scopes']} dashboard scopes "
+                f"({result['keys']} cache keys) in {result['seconds']}s"
+            )
+            for scope, error in result['failures']:
+                self.stderr.write(f"Failed to warm {scope}: {error}")
+            if options['every'] is None:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_bootstrapadminstate'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.CheckConstraint(condition=models.Q(('clock_out__isnull', True), ('clock_out__gte', models.F('clock_in')), _connector='OR'), name='attendance_clock_out_after_clock_in', violation_error_message='The clock out time cannot be before the clock in time'),
+        ),
+    ]
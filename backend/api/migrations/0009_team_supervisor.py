@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_attendance_clock_out_after_clock_in'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='team_supervisor',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='rating',
+            name='team_supervisor',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='team_supervisor',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['team_supervisor', '-date'], name='attendance_team_sup_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['team_supervisor', '-created_at'], name='rating_team_sup_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['team_supervisor', '-created_at'], name='task_team_sup_created_idx'),
+        ),
+    ]
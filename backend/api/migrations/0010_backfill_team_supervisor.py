@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def backfill(model, supervisor_subquery):
+    # one UPDATE per primary-key range, each committed on its own, so large
+    # tables are never locked as a whole
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    if last is None:
+        return
+    for start in range(0, last + 1, BATCH_SIZE):
+        model.objects.filter(pk__gte=start, pk__lt=start + BATCH_SIZE).update(team_supervisor=supervisor_subquery)
+
+
+def backfill_team_supervisor(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    Task = apps.get_model('api', 'Task')
+    Attendance = apps.get_model('api', 'Attendance')
+    Rating = apps.get_model('api', 'Rating')
+
+    employee_supervisor = Subquery(User.objects.filter(pk=OuterRef('employee_id')).values('supervisor_id')[:1])
+    backfill(Task, employee_supervisor)
+    backfill(Attendance, employee_supervisor)
+    backfill(Rating, Subquery(Task.objects.filter(pk=OuterRef('task_id')).values('team_supervisor_id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0009_team_supervisor'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_team_supervisor, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    OrgClosure = apps.get_model('api', 'OrgClosure')
+
+    parents = dict(User.objects.values_list('id', 'supervisor_id'))
+    rows = []
+    for user_id in parents:
+        ancestor_id, depth, seen = user_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            rows.append(OrgClosure(ancestor_id=ancestor_id, descendant_id=user_id, depth=depth))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    OrgClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_backfill_team_supervisor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrgClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_paths', to=settings.AUTH_USER_MODEL)),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_paths', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ancestor', 'depth', 'descendant'], name='org_closure_ancestor_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='org_closure_unique_path')],
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
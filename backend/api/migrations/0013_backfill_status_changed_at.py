@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 5000
+
+
+def backfill_status_changed_at(apps, schema_editor):
+    # best available guess for when each existing task entered its status
+    Task = apps.get_model('api', 'Task')
+    last = Task.objects.order_by('-pk').values_list('pk', flat=True).first()
+    if last is None:
+        return
+    for start in range(0, last + 1, BATCH_SIZE):
+        Task.objects.filter(pk__gte=start, pk__lt=start + BATCH_SIZE, status_changed_at__isnull=True).update(
+            status_changed_at=Coalesce(F('completed_at'), F('created_at'))
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0012_task_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_status_changed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_backfill_status_changed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('total_squares', models.PositiveIntegerField(default=0)),
+                ('histogram', models.JSONField(default=list)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('rated_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('employee', 'rated_by'), name='rating_stat_unique')],
+            },
+        ),
+    ]
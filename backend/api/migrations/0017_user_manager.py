@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-19 19:13
+
+import api.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_sync'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', api.models.UserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-19 19:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from api.online_migrations import AddIndexOnline
+
+
+def build_buckets(apps, schema_editor):
+    # the same batched rebuild the nightly sweep runs
+    from api import deadlines
+
+    deadlines.rebuild(batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0017_user_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeadlineBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deadline', models.DateField()),
+                ('open_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        AddIndexOnline(
+            model_name='task',
+            index=models.Index(fields=['employee', 'deadline'], name='task_employee_deadline_idx'),
+        ),
+        migrations.AddField(
+            model_name='deadlinebucket',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='deadlinebucket',
+            index=models.Index(fields=['deadline'], name='deadline_bucket_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='deadlinebucket',
+            constraint=models.UniqueConstraint(fields=('employee', 'deadline'), name='deadline_bucket_unique'),
+        ),
+        migrations.RunPython(build_buckets, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,26 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.utils import timezone
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.core.exceptions import ValidationError
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+from datetime import date, datetime
+
+from . import hashing
+
+
+def touch(kwargs):
+    # auto_now only reaches the database if updated_at is among the saved fields
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None:
+        kwargs['update_fields'] = {*update_fields, 'updated_at'}
+
+
+class UserManager(BaseUserManager):
+    def _create_user_object(self, username, email, password, **extra_fields):
+        # Django assigns make_password() directly; go through the hashing pool
+        user = super()._create_user_object(username, email, None, **extra_fields)
+        user.set_password(password)
+        return user
+
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -19,10 +38,199 @@ class User(AbstractUser):
         related_name='employees',
         limit_choices_to={'role': 'supervisor'}
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = UserManager()
 
     def __str__(self):
         return self.username
 
+    # hashing runs in the bounded pool from api/hashing.py
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        correct, must_update = hashing.verify_password(raw_password, self.password)
+        if correct and must_update:
+            # upgrade to the current hasher/work factor on a successful login
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return correct
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'supervisor_id' in instance.__dict__:
+            instance._loaded_supervisor_id = instance.supervisor_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        touch(kwargs)
+        update_fields = kwargs.get('update_fields')
+        supervisor_changed = (
+            not self._state.adding
+            and (update_fields is None or 'supervisor' in update_fields)
+            and getattr(self, '_loaded_supervisor_id', self.supervisor_id) != self.supervisor_id
+        )
+        adding = self._state.adding
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if adding:
+                OrgClosure.objects.add_node(self)
+            elif supervisor_changed:
+                OrgClosure.objects.move_node(self)
+                self.sync_team_supervisor(getattr(self, '_loaded_supervisor_id', None))
+        self._loaded_supervisor_id = self.supervisor_id
+
+    def sync_team_supervisor(self, previous_supervisor_id=None):
+        # keep the denormalized team_supervisor columns in step with User.supervisor
+        now = timezone.now()
+        Task.objects.filter(employee=self).update(team_supervisor=self.supervisor_id, updated_at=now)
+        Attendance.objects.filter(employee=self).update(team_supervisor=self.supervisor_id, updated_at=now)
+        Rating.objects.filter(task__employee=self).update(team_supervisor=self.supervisor_id, updated_at=now)
+        # everyone below moved too and their rows just entered the new
+        # ancestors' scope, so delta sync has to send them again
+        below = OrgClosure.objects.below(self)
+        User.objects.filter(id__in=below).update(updated_at=now)
+        Task.objects.filter(employee__in=below).update(updated_at=now)
+        Attendance.objects.filter(employee__in=below).update(updated_at=now)
+        Rating.objects.filter(task__employee__in=below).update(updated_at=now)
+        # and left the old supervisor's chain; tombstones there let those caches
+        # drop them (sync skips ids that are still in the reader's scope)
+        if previous_supervisor_id:
+            subtree = OrgClosure.objects.subtree(self)
+            moved = (
+                ('task', Task.objects.filter(employee__in=subtree)),
+                ('attendance', Attendance.objects.filter(employee__in=subtree)),
+                ('rating', Rating.objects.filter(task__employee__in=subtree)),
+                ('user', User.objects.filter(id__in=subtree)),
+            )
+            Tombstone.objects.bulk_create(
+                (
+                    Tombstone(model=model, object_id=pk, team_supervisor_id=previous_supervisor_id, deleted_at=now)
+                    for model, queryset in moved for pk in queryset.values_list('pk', flat=True).iterator()
+                ),
+                batch_size=1000,
+            )
+
+class OrgClosureManager(models.Manager):
+    # closure table over User.supervisor: one row per (ancestor, descendant)
+    # pair including depth-0 self rows, so "everyone under X" is one indexed lookup
+
+    def subtree(self, user):
+        return self.filter(ancestor=user).values('descendant')
+
+    def below(self, user):
+        return self.filter(ancestor=user, depth__gt=0).values('descendant')
+
+    def is_below(self, user, other_id):
+        return self.filter(ancestor=user, descendant_id=other_id, depth__gt=0).exists()
+
+    def add_node(self, user):
+        rows = [self.model(ancestor=user, descendant=user, depth=0)]
+        if user.supervisor_id:
+            rows += [
+                self.model(ancestor_id=ancestor_id, descendant=user, depth=depth + 1)
+                for ancestor_id, depth in self.filter(descendant_id=user.supervisor_id).values_list('ancestor_id', 'depth')
+            ]
+        self.bulk_create(rows, ignore_conflicts=True)
+
+    def move_node(self, user):
+        if user.supervisor_id and self.filter(ancestor=user, descendant_id=user.supervisor_id).exists():
+            raise ValidationError("A user cannot report to someone in their own team.")
+
+        subtree = self.subtree(user)
+        # drop every path from the old ancestors into the moved subtree
+        self.filter(descendant_id__in=subtree).exclude(ancestor_id__in=subtree).delete()
+        if user.supervisor_id:
+            ancestors = list(self.filter(descendant_id=user.supervisor_id).values_list('ancestor_id', 'depth'))
+            members = list(self.filter(ancestor=user).values_list('descendant_id', 'depth'))
+            self.bulk_create(
+                [
+                    self.model(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + down + 1)
+                    for ancestor_id, up in ancestors
+                    for descendant_id, down in members
+                ],
+                batch_size=1000,
+            )
+
+    def rebuild(self):
+        parents = dict(User.objects.values_list('id', 'supervisor_id'))
+        rows = []
+        for user_id in parents:
+            ancestor_id, depth, seen = user_id, 0, set()
+            while ancestor_id is not None and ancestor_id not in seen:
+                seen.add(ancestor_id)
+                rows.append(self.model(ancestor_id=ancestor_id, descendant_id=user_id, depth=depth))
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
+class OrgClosure(models.Model):
+    ancestor = models.ForeignKey('User', on_delete=models.CASCADE, related_name='descendant_paths')
+    descendant = models.ForeignKey('User', on_delete=models.CASCADE, related_name='ancestor_paths')
+    depth = models.PositiveIntegerField()
+
+    objects = OrgClosureManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='org_closure_unique_path'),
+        ]
+        indexes = [
+            models.Index(fields=['ancestor', 'depth', 'descendant'], name='org_closure_ancestor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor} > {self.descendant} ({self.depth})"
+
+
+class AttendanceManager(models.Manager):
+    # clock-in/out are single statements so concurrent double-taps can't race
+    # past the (employee, date) unique index or a missing clock-out row
+
+    def _returning(self, sql, params):
+        db = router.db_for_write(self.model)
+        ops = connections[db].ops
+        opts = self.model._meta
+        columns = {
+            f.name: ops.quote_name(f.column)
+            for f in (opts.get_field(n) for n in ('employee', 'date', 'clock_in', 'clock_out', 'team_supervisor', 'updated_at'))
+        }
+        sql = sql.format(table=ops.quote_name(opts.db_table), **columns)
+        sql += " RETURNING id, {employee}, {date}, {clock_in}, {clock_out}, {team_supervisor}, {updated_at}".format(**columns)
+        params = [
+            ops.adapt_datetimefield_value(p) if isinstance(p, datetime)
+            else ops.adapt_datefield_value(p) if isinstance(p, date)
+            else p
+            for p in params
+        ]
+        with transaction.atomic(using=db):
+            rows = list(self.raw(sql, params, using=db))
+        return rows[0] if rows else None
+
+    def clock_in(self, employee, now=None):
+        now = now or timezone.now()
+        return self._returning(
+            "INSERT INTO {table} ({employee}, {date}, {clock_in}, {team_supervisor}, {updated_at}) VALUES (%s, %s, %s, %s, %s) "
+            "ON CONFLICT ({employee}, {date}) DO NOTHING",
+            [employee.pk, now.date(), now, employee.supervisor_id, now],
+        )
+
+    def clock_out(self, employee, now=None):
+        now = now or timezone.now()
+        return self._returning(
+            "UPDATE {table} SET {clock_out} = %s, {updated_at} = %s "
+            "WHERE {employee} = %s AND {date} = %s AND {clock_out} IS NULL AND {clock_in} <= %s",
+            [now, now, employee.pk, now.date(), now],
+        )
+
+
 class Attendance(models.Model):
     employee = models.ForeignKey(
         'User',
@@ -33,20 +241,46 @@ class Attendance(models.Model):
     clock_in = models.DateTimeField(default=timezone.now)
     clock_out = models.DateTimeField(null=True, blank=True)
     date = models.DateField(default=timezone.now)
+    # copy of employee.supervisor so team queries don't join through User
+    team_supervisor = models.ForeignKey(
+        'User',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AttendanceManager()
 
     class Meta:
         unique_together = ('employee', 'date')
         ordering =  ['-date', '-clock_in']
+        indexes = [
+            models.Index(fields=['team_supervisor', '-date'], name='attendance_team_sup_date_idx'),
+            # default ordering and the admin date hierarchy
+            models.Index(fields=['-date', '-clock_in'], name='attendance_date_idx'),
+            # delta sync
+            models.Index(fields=['updated_at'], name='attendance_updated_idx'),
+            models.Index(fields=['team_supervisor', 'updated_at'], name='attendance_team_sup_upd_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(clock_out__isnull=True) | models.Q(clock_out__gte=models.F('clock_in')),
+                name='attendance_clock_out_after_clock_in',
+                violation_error_message="The clock out time cannot be before the clock in time",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.employee} - {self.date}"
-    
-    def clean(self):
-        if self.clock_out and self.clock_out < self.clock_in:
-            raise ValidationError("The clock out time cannot be before the clock in time")
-        
+
     def save(self, *args, **kwargs):
-        self.full_clean() # validation run
+        touch(kwargs)
+        if kwargs.get('update_fields') is None:
+            self.team_supervisor_id = self.employee.supervisor_id
         super().save(*args, **kwargs)
 
     @property
@@ -96,9 +330,34 @@ class Task(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=25, choices=STATUS, default='pending')
     deadline = models.DateField(null=True, blank=True)
+    status_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # bumped by every API update and the overdue sweep; clients send the
+    # version they read back in If-Match and get a 409 if it has moved on
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # copy of employee.supervisor so team queries don't join through User
+    team_supervisor = models.ForeignKey(
+        'User',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['team_supervisor', '-created_at'], name='task_team_sup_created_idx'),
+            models.Index(fields=['-created_at'], name='task_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='task_status_created_idx'),
+            # delta sync
+            models.Index(fields=['updated_at'], name='task_updated_idx'),
+            models.Index(fields=['team_supervisor', 'updated_at'], name='task_team_sup_updated_idx'),
+            # recounting deadline buckets and building an employee's upcoming list
+            models.Index(fields=['employee', 'deadline'], name='task_employee_deadline_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.employee}"
@@ -116,10 +375,111 @@ class Task(models.Model):
         else:
             self.status = 'in_progress' if self.status == 'pending' else self.status
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in instance.__dict__:
+            instance._loaded_status = instance.status
+        if 'employee_id' in instance.__dict__:
+            instance._loaded_employee_id = instance.employee_id
+        if 'deadline' in instance.__dict__:
+            instance._loaded_deadline = instance.deadline
+        return instance
+
     def save(self, *args, **kwargs):
         # always update status before saving
         self.update_status()
-        super().save(*args, **kwargs)
+        touch(kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.team_supervisor_id = self.employee.supervisor_id
+        elif 'employee' in update_fields or 'employee_id' in update_fields:
+            self.team_supervisor_id = self.employee.supervisor_id
+            update_fields = kwargs['update_fields'] = {*update_fields, 'team_supervisor'}
+
+        adding = self._state.adding
+        previous_status = None if adding else getattr(self, '_loaded_status', self.status)
+        event = None
+        if adding or previous_status != self.status:
+            now = timezone.now()
+            event = TaskEvent(
+                employee_id=self.employee_id,
+                from_status=previous_status,
+                to_status=self.status,
+                from_status_since=self.status_changed_at,
+                at=now,
+            )
+            self.status_changed_at = now
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'status', 'status_changed_at'}
+
+        # the event commits or rolls back together with the status change
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if event is not None:
+                event.task = self
+                event.save()
+        self._loaded_status = self.status
+        self._loaded_employee_id = self.employee_id
+        self._loaded_deadline = self.deadline
+
+class TaskEvent(models.Model):
+    # append-only log of task status transitions; from_status is null for
+    # creation and from_status_since is when the task entered from_status
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='events')
+    employee = models.ForeignKey('User', on_delete=models.CASCADE, related_name='+')
+    from_status = models.CharField(max_length=25, choices=Task.STATUS, null=True, blank=True)
+    to_status = models.CharField(max_length=25, choices=Task.STATUS)
+    from_status_since = models.DateTimeField(null=True, blank=True)
+    at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['task', 'at'], name='task_event_task_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}: {self.from_status} -> {self.to_status}"
+
+
+class TaskStatusStat(models.Model):
+    # incremental per-employee aggregates maintained from TaskEvent by
+    # `manage.py consume_task_events`; histogram maps bucket label -> count
+    employee = models.ForeignKey('User', on_delete=models.CASCADE, related_name='task_status_stats')
+    status = models.CharField(max_length=25, choices=Task.STATUS)
+    entered = models.PositiveIntegerField(default=0)
+    exited = models.PositiveIntegerField(default=0)
+    seconds_in_status = models.BigIntegerField(default=0)
+    histogram = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'status'], name='task_status_stat_unique'),
+        ]
+
+
+class DeadlineBucket(models.Model):
+    # open tasks per employee and deadline date, recounted on task saves and
+    # rebuilt by `manage.py mark_overdue_tasks`; see api/deadlines.py
+    employee = models.ForeignKey('User', on_delete=models.CASCADE, related_name='+')
+    deadline = models.DateField()
+    open_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'deadline'], name='deadline_bucket_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['deadline'], name='deadline_bucket_date_idx'),
+        ]
+
+
+class EventCursor(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
 
 class Rating(models.Model):
     RATINGS_SCALE = [(i, str(i)) for i in range(1, 6)] # rating scale is from 1 - 5
@@ -140,14 +500,73 @@ class Rating(models.Model):
     rating = models.PositiveSmallIntegerField(choices=RATINGS_SCALE)
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # copy of task.employee.supervisor so team queries don't join twice
+    team_supervisor = models.ForeignKey(
+        'User',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
 
     class Meta:
         unique_together = ('task', 'rated_by')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['team_supervisor', '-created_at'], name='rating_team_sup_created_idx'),
+            models.Index(fields=['-created_at'], name='rating_created_idx'),
+            models.Index(fields=['rating', '-created_at'], name='rating_score_created_idx'),
+            # delta sync
+            models.Index(fields=['updated_at'], name='rating_updated_idx'),
+            models.Index(fields=['team_supervisor', 'updated_at'], name='rating_team_sup_updated_idx'),
+        ]
 
     def __str__(self):
         return f"The rating is {self.rating}/5 for {self.task}"
 
+    def save(self, *args, **kwargs):
+        touch(kwargs)
+        if kwargs.get('update_fields') is None:
+            self.team_supervisor_id = self.task.team_supervisor_id
+        super().save(*args, **kwargs)
+
+
+class RatingStat(models.Model):
+    # running sums of one supervisor's ratings of one employee, maintained by
+    # `manage.py calibrate_ratings`; histogram is the count of each score 1-5
+    employee = models.ForeignKey('User', on_delete=models.CASCADE, related_name='+')
+    rated_by = models.ForeignKey('User', on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    total_squares = models.PositiveIntegerField(default=0)
+    histogram = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'rated_by'], name='rating_stat_unique'),
+        ]
+
+
+class Tombstone(models.Model):
+    # deletion log for /api/sync/; the row is gone, so who could see it is
+    # copied here (plain ids, the users may be deleted too)
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    employee_id = models.BigIntegerField(null=True)
+    team_supervisor_id = models.BigIntegerField(null=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+            models.Index(fields=['team_supervisor_id', 'deleted_at'], name='tombstone_team_sup_idx'),
+            models.Index(fields=['employee_id', 'deleted_at'], name='tombstone_employee_idx'),
+        ]
+
+
 class BootstrapAdminState(models.Model):
     used = models.BooleanField(default=False)
     used_at = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,307 @@
+import time
+
+from django.db import transaction
+from django.db.migrations.operations import AddIndex, RemoveIndex
+from django.db.models import UniqueConstraint
+from django.db.migrations.operations.base import Operation
+
+# Migration operations for the big tables (api_task, api_attendance) that
+# don't hold a write lock for the length of the whole change. Both need the
+# migration to set `atomic = False`:
+#
+#   BackfillRows   fills values in primary-key batches, each committed on its
+#                  own, sleeping `pause` seconds between batches
+#   AddIndexOnline / RemoveIndexOnline
+#                  CREATE/DROP INDEX CONCURRENTLY on Postgres (partition by
+#                  partition on a partitioned table), plain AddIndex/RemoveIndex
+#                  elsewhere
+#
+# `manage.py estimate_migrations` reports what pending migrations would lock
+# and for roughly how long before they are run.
+
+BATCH_SIZE = 5000
+BATCH_PAUSE = 0.1
+
+
+def _require_non_atomic(operation, schema_editor):
+    if schema_editor.connection.in_atomic_block:
+        raise ValueError(f"{operation.__class__.__name__} needs `atomic = False` on its migration.")
+
+
+def backfill(queryset, values, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    # one UPDATE per primary-key range so only that range is ever locked
+    last = queryset.order_by('-pk').values_list('pk', flat=True).first()
+    if last is None:
+        return 0
+    updated = 0
+    first = queryset.order_by('pk').values_list('pk', flat=True).first()
+    for start in range(first, last + 1, batch_size):
+        with transaction.atomic(using=queryset.db):
+            updated += queryset.filter(pk__gte=start, pk__lt=start + batch_size).update(**values)
+        if pause and start + batch_size <= last:
+            time.sleep(pause)
+    return updated
+
+
+class BackfillRows(Operation):
+    reversible = True
+    reduces_to_sql = False
+    atomic = False
+
+    def __init__(self, model_name, values, filter=None, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+        self.model_name = model_name
+        self.values = values
+        self.filter = filter
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def deconstruct(self):
+        kwargs = {'model_name': self.model_name, 'values': self.values}
+        if self.filter is not None:
+            kwargs['filter'] = self.filter
+        if self.batch_size != BATCH_SIZE:
+            kwargs['batch_size'] = self.batch_size
+        if self.pause != BATCH_PAUSE:
+            kwargs['pause'] = self.pause
+        return self.__class__.__name__, [], kwargs
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def queryset(self, model, alias):
+        queryset = model._default_manager.using(alias)
+        return queryset if self.filter is None else queryset.filter(self.filter)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        _require_non_atomic(self, schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        backfill(self.queryset(model, schema_editor.connection.alias), self.values, self.batch_size, self.pause)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        # old values are gone; unapplying leaves the rows as they are
+        pass
+
+    def describe(self):
+        return f"Backfill {', '.join(self.values)} on {self.model_name} in batches of {self.batch_size}"
+
+    @property
+    def migration_name_fragment(self):
+        return f"backfill_{self.model_name.lower()}"
+
+
+def drop_invalid_index(schema_editor, name):
+    # an interrupted CONCURRENTLY build leaves an INVALID index behind
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = %s AND NOT pg_index.indisvalid",
+            [name],
+        )
+        if cursor.fetchone() is not None:
+            schema_editor.execute(f"DROP INDEX CONCURRENTLY {schema_editor.quote_name(name)}")
+
+
+def _partitions(schema_editor, table):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            [table],
+        )
+        return [name for name, in cursor.fetchall()]
+
+
+def _add_index(schema_editor, model, index):
+    partitions = _partitions(schema_editor, model._meta.db_table)
+    if not partitions:
+        drop_invalid_index(schema_editor, index.name)
+        schema_editor.add_index(model, index, concurrently=True)
+        return
+
+    # a partitioned table can't be indexed concurrently: add the index to the
+    # parent alone, build it on each partition concurrently and attach
+    parent = index.create_sql(model, schema_editor)
+    parent.template = parent.template.replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1)
+    parent.template = parent.template.replace(" ON %(table)s", " ON ONLY %(table)s", 1)
+    schema_editor.execute(parent)
+    for partition in partitions:
+        name = f"{partition}_{index.name}"[:63]
+        drop_invalid_index(schema_editor, name)
+        statement = index.create_sql(model, schema_editor, concurrently=True)
+        statement.template = statement.template.replace(" CONCURRENTLY ", " CONCURRENTLY IF NOT EXISTS ", 1)
+        statement.parts.update(name=schema_editor.quote_name(name), table=schema_editor.quote_name(partition))
+        schema_editor.execute(statement)
+        schema_editor.execute(
+            f"ALTER INDEX {schema_editor.quote_name(index.name)} ATTACH PARTITION {schema_editor.quote_name(name)}"
+        )
+
+
+def _remove_index(schema_editor, model, index):
+    # partitioned indexes can only be dropped in one go; that takes a brief lock
+    partitioned = bool(_partitions(schema_editor, model._meta.db_table))
+    schema_editor.remove_index(model, index, concurrently=not partitioned)
+
+
+class AddIndexOnline(AddIndex):
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        _require_non_atomic(self, schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            _add_index(schema_editor, model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        _require_non_atomic(self, schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            _remove_index(schema_editor, model, self.index)
+
+    def describe(self):
+        return super().describe() + " (concurrently)"
+
+
+class RemoveIndexOnline(RemoveIndex):
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        _require_non_atomic(self, schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            _remove_index(schema_editor, model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        _require_non_atomic(self, schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            _add_index(schema_editor, model, index)
+
+    def describe(self):
+        return super().describe() + " (concurrently)"
+
+
+# dry-run estimates: rows touched, the lock taken, how long writes are blocked
+# and how long the operation runs, at a rough rows_per_second
+
+# only change the migration state; no SQL is run
+STATE_ONLY = ('AlterModelManagers', 'AlterModelOptions')
+
+
+def table_rows(connection, table):
+    if table not in connection.introspection.table_names():
+        # created earlier in the same run
+        return 0
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # planner statistics, so this stays instant on big tables; a
+            # partitioned table's rows are its partitions'
+            cursor.execute(
+                "SELECT SUM(reltuples)::bigint, bool_and(reltuples >= 0) FROM pg_class "
+                "WHERE (oid = to_regclass(%s) AND relkind = 'r') "
+                "OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))",
+                [table, table],
+            )
+            rows, analyzed = cursor.fetchone()
+            if analyzed:
+                return rows
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+        return cursor.fetchone()[0]
+
+
+def _column_changes(connection, old, new):
+    old_params, new_params = old.db_parameters(connection), new.db_parameters(connection)
+    return {
+        'type': old_params['type'] != new_params['type'],
+        'not_null': old.null and not new.null,
+        'index': (new.db_index or new.unique) and not (old.db_index or old.unique),
+    }
+
+
+def estimate(operation, app_label, before, after, connection, rows_per_second):
+    postgres = connection.vendor == 'postgresql'
+    kind = operation.__class__.__name__
+    if kind in ('RunPython', 'RunSQL'):
+        return {'rows': None, 'lock': "unknown, custom code", 'blocking': None, 'duration': None}
+    if kind in STATE_ONLY:
+        return {'rows': 0, 'lock': "none, no schema change", 'blocking': 0, 'duration': 0}
+    if isinstance(operation, BackfillRows):
+        model = before.apps.get_model(app_label, operation.model_name)
+        rows = table_rows(connection, model._meta.db_table) and operation.queryset(model, connection.alias).count()
+        batches = -(-rows // operation.batch_size)
+        return {
+            'rows': rows,
+            'lock': f"row locks, {operation.batch_size} rows at a time",
+            'blocking': min(rows, operation.batch_size) / rows_per_second,
+            'duration': rows / rows_per_second + max(batches - 1, 0) * operation.pause,
+        }
+
+    model_name = getattr(operation, 'model_name', None) or getattr(operation, 'name', None)
+    if model_name is None or (app_label, model_name.lower()) not in before.models:
+        # new tables and anything not tied to one
+        return None
+
+    model = before.apps.get_model(app_label, model_name)
+    if model._meta.db_table not in connection.introspection.table_names():
+        # created earlier in the same plan, so still empty when this runs
+        return None
+    rows = table_rows(connection, model._meta.db_table)
+    scan = rows / rows_per_second
+    brief = {'rows': rows, 'lock': "ACCESS EXCLUSIVE, metadata only", 'blocking': 0, 'duration': 0}
+
+    if isinstance(operation, (AddIndexOnline, RemoveIndexOnline)) and postgres:
+        build = scan if isinstance(operation, AddIndexOnline) else 0
+        return {'rows': rows, 'lock': "SHARE UPDATE EXCLUSIVE, writes continue", 'blocking': 0, 'duration': build}
+    if isinstance(operation, AddIndex):
+        return {'rows': rows, 'lock': "SHARE, blocks writes", 'blocking': scan, 'duration': scan}
+    if isinstance(operation, RemoveIndex):
+        return brief
+
+    # anything else that alters the table is a full copy on SQLite
+    rebuild = {'rows': rows, 'lock': "table rebuild, blocks writes", 'blocking': scan, 'duration': scan}
+    if kind == 'AddField':
+        if not postgres:
+            return rebuild
+        # Postgres 11+ adds a column with a constant default without touching rows
+        field = operation.field
+        if field.db_index or field.unique or field.remote_field is not None:
+            return {'rows': rows, 'lock': "SHARE, index/constraint build blocks writes", 'blocking': scan, 'duration': scan}
+        return brief
+    if kind == 'AlterField':
+        old = model._meta.get_field(operation.name)
+        new = after.apps.get_model(app_label, model_name)._meta.get_field(operation.name)
+        changes = _column_changes(connection, old, new)
+        if not any(changes.values()):
+            return {'rows': rows, 'lock': "none, no schema change", 'blocking': 0, 'duration': 0}
+        if not postgres:
+            return rebuild
+        if changes['type']:
+            return {'rows': rows, 'lock': "ACCESS EXCLUSIVE, table rewrite", 'blocking': scan, 'duration': scan}
+        if changes['not_null']:
+            return {'rows': rows, 'lock': "ACCESS EXCLUSIVE, full scan for NOT NULL", 'blocking': scan, 'duration': scan}
+        return {'rows': rows, 'lock': "SHARE, index build blocks writes", 'blocking': scan, 'duration': scan}
+    if kind in ('RemoveField', 'RenameField'):
+        return brief if postgres else rebuild
+    if kind == 'AddConstraint':
+        constraint = operation.constraint
+        if isinstance(constraint, UniqueConstraint):
+            # a unique constraint is a unique index build, not a row-by-row check;
+            # partial/expression ones are a plain CREATE UNIQUE INDEX everywhere
+            if constraint.condition or constraint.contains_expressions or constraint.include:
+                return {'rows': rows, 'lock': "SHARE, unique index build blocks writes", 'blocking': scan, 'duration': scan}
+            if not postgres:
+                return rebuild
+            return {'rows': rows, 'lock': "ACCESS EXCLUSIVE, unique index build", 'blocking': scan, 'duration': scan}
+        if not postgres:
+            return rebuild
+        return {'rows': rows, 'lock': "ACCESS EXCLUSIVE, validates every row", 'blocking': scan, 'duration': scan}
+    return brief
@@ -0,0 +1,202 @@
+import re
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Attendance
+from .online_migrations import drop_invalid_index
+
+# Optional monthly range partitioning of the attendance table (Postgres only),
+# driven by `manage.py attendance_partitions`.
+#
+# --convert swaps the existing table for a partitioned one without copying
+# rows: the old table is renamed and attached whole as the first partition
+# ("legacy", everything before the boundary month). Its indexes, unique and
+# foreign keys are reused as the parent's, so the swap only holds the table
+# lock for catalog changes. Later months get their own partitions, created
+# a few months ahead by the same command (run it daily). There is no default
+# partition, which would rule out detaching concurrently. Partitions older
+# than the retention period are detached and either moved to an archive
+# schema or dropped.
+#
+# Queries with a date predicate only touch the partitions in range, and
+# ORDER BY date DESC LIMIT n reads the newest partitions first.
+
+TABLE = Attendance._meta.db_table
+LEGACY = f"{TABLE}_legacy"
+SEQUENCE = f"{TABLE}_part_id_seq"
+RANGE_CHECK = 'attendance_legacy_range'
+ID_DATE_KEY = 'attendance_id_date_key'
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def is_partitioned(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def partitions(connection):
+    # (name, first day, first day after) per partition; None for MINVALUE
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    result = []
+    for name, bound in rows:
+        lower, upper = re.match(r"FOR VALUES FROM \((.+)\) TO \((.+)\)", bound).groups()
+        result.append((
+            name,
+            None if lower == 'MINVALUE' else date.fromisoformat(lower.strip("'")),
+            date.fromisoformat(upper.strip("'")),
+        ))
+    return result
+
+
+def _literal(day):
+    # DDL can't take bind parameters; isoformat() is digits and dashes only
+    return f"'{day.isoformat()}'"
+
+
+def convert(connection, months_ahead):
+    q = connection.ops.quote_name
+    today = timezone.now().date()
+
+    # slow parts first, none of which block writes
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MAX({q('date')}) FROM {q(TABLE)}")
+        latest = cursor.fetchone()[0] or today
+        # a month of slack so clock-ins around a month end never hit the check before the swap
+        boundary = add_months(month_start(max(latest, today)), 2)
+
+        # the parent's unique key has to include the partition column
+        with connection.schema_editor(atomic=False) as editor:
+            drop_invalid_index(editor, ID_DATE_KEY)
+        cursor.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {q(ID_DATE_KEY)} ON {q(TABLE)} (id, {q('date')})")
+        # a validated CHECK lets ATTACH PARTITION skip scanning the table
+        cursor.execute(f"ALTER TABLE {q(TABLE)} DROP CONSTRAINT IF EXISTS {q(RANGE_CHECK)}")
+        cursor.execute(f"ALTER TABLE {q(TABLE)} ADD CONSTRAINT {q(RANGE_CHECK)} CHECK ({q('date')} < {_literal(boundary)}) NOT VALID")
+        cursor.execute(f"ALTER TABLE {q(TABLE)} VALIDATE CONSTRAINT {q(RANGE_CHECK)}")
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {q(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {q(TABLE)}")
+        last_id = cursor.fetchone()[0]
+
+        # recreate the old table's keys and indexes on the parent under their
+        # own names; on attach Postgres adopts the old ones instead of building
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(x.indexrelid), con.contype, pg_get_constraintdef(con.oid) "
+            "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+            "LEFT JOIN pg_constraint con ON con.conindid = x.indexrelid AND con.conrelid = x.indrelid "
+            "WHERE x.indrelid = to_regclass(%s)",
+            [TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+
+        statements = []
+        for name, index_def, contype, constraint_def in indexes:
+            if name == ID_DATE_KEY:
+                continue
+            if contype == 'p':
+                # unique rather than primary: the old table keeps its own
+                # primary key, which can't back the parent's
+                statements.append(f"ALTER TABLE {q(TABLE)} ADD CONSTRAINT {q(name)} UNIQUE (id, {q('date')})")
+            elif contype == 'u':
+                statements.append(f"ALTER TABLE {q(TABLE)} ADD CONSTRAINT {q(name)} {constraint_def}")
+            else:
+                statements.append(re.sub(r" ON \S+ USING ", f" ON {q(TABLE)} USING ", index_def, count=1))
+        statements += [f"ALTER TABLE {q(TABLE)} ADD CONSTRAINT {q(name)} {definition}" for name, definition in foreign_keys]
+
+        cursor.execute(f"ALTER TABLE {q(TABLE)} RENAME TO {q(LEGACY)}")
+        for name, *_ in indexes:
+            if name != ID_DATE_KEY:
+                cursor.execute(f"ALTER INDEX {q(name)} RENAME TO {q(name[:56] + '_legacy')}")
+        cursor.execute(f"ALTER TABLE {q(LEGACY)} ADD CONSTRAINT {q(ID_DATE_KEY)} UNIQUE USING INDEX {q(ID_DATE_KEY)}")
+
+        # ids come from a sequence owned by the parent, so archiving the
+        # legacy partition later doesn't take the id default with it
+        cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'", [LEGACY])
+        if cursor.fetchone()[0]:
+            cursor.execute(f"ALTER TABLE {q(LEGACY)} ALTER COLUMN id DROP IDENTITY")
+        else:
+            cursor.execute(f"ALTER TABLE {q(LEGACY)} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"CREATE SEQUENCE {q(SEQUENCE)}")
+        cursor.execute("SELECT setval(%s, %s, false)", [SEQUENCE, last_id + 1])
+
+        cursor.execute(
+            f"CREATE TABLE {q(TABLE)} (LIKE {q(LEGACY)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({q('date')})"
+        )
+        cursor.execute(f"ALTER TABLE {q(TABLE)} DROP CONSTRAINT {q(RANGE_CHECK)}")
+        cursor.execute(f"ALTER TABLE {q(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f"ALTER SEQUENCE {q(SEQUENCE)} OWNED BY {q(TABLE)}.id")
+        for statement in statements:
+            cursor.execute(statement)
+
+        cursor.execute(f"ALTER TABLE {q(TABLE)} ATTACH PARTITION {q(LEGACY)} FOR VALUES FROM (MINVALUE) TO ({_literal(boundary)})")
+        cursor.execute(f"ALTER TABLE {q(LEGACY)} DROP CONSTRAINT {q(RANGE_CHECK)}")
+
+    return boundary, ensure_partitions(connection, months_ahead)
+
+
+def ensure_partitions(connection, months_ahead):
+    # monthly partitions from the last covered month through `months_ahead`
+    # months from now
+    q = connection.ops.quote_name
+    month = max(upper for _, _, upper in partitions(connection))
+    last = add_months(month_start(timezone.now().date()), months_ahead)
+    created = []
+    while month <= last:
+        following = add_months(month, 1)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE {q(partition_name(month))} PARTITION OF {q(TABLE)} "
+                f"FOR VALUES FROM ({_literal(month)}) TO ({_literal(following)})"
+            )
+        created.append(partition_name(month))
+        month = following
+    return created
+
+
+def detach_old(connection, retain_months, archive_schema=None):
+    # partitions wholly older than `retain_months` months come off the table;
+    # kept in `archive_schema` if given, dropped otherwise
+    q = connection.ops.quote_name
+    cutoff = add_months(month_start(timezone.now().date()), -retain_months)
+    detached = []
+    for name, _, upper in partitions(connection):
+        if upper > cutoff:
+            continue
+        with connection.cursor() as cursor:
+            # CONCURRENTLY (Postgres 14+) doesn't block queries on the parent
+            concurrently = ' CONCURRENTLY' if connection.pg_version >= 140000 else ''
+            cursor.execute(f"ALTER TABLE {q(TABLE)} DETACH PARTITION {q(name)}{concurrently}")
+            if archive_schema:
+                cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {q(archive_schema)}")
+                cursor.execute(f"ALTER TABLE {q(name)} SET SCHEMA {q(archive_schema)}")
+            else:
+                cursor.execute(f"DROP TABLE {q(name)}")
+        detached.append(name)
+    return detached
@@ -0,0 +1,97 @@
+from django.db.models import BooleanField, Case, F, FloatField, Func, Q, Value, When
+from django.db.models.functions import Cast, Round
+from rest_framework.response import Response
+
+# Read-only list responses built straight from values_list() rows instead of
+# ModelSerializer instances. Each projection produces exactly the keys and
+# values its serializer would, with on_time and time_worked computed in SQL.
+
+
+class HoursBetween(Func):
+    arg_joiner = ' - '
+    template = 'EXTRACT(EPOCH FROM (%(expressions)s)) / 3600.0'
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='(julianday(%(expressions)s)) * 24.0',
+            arg_joiner=') - julianday(',
+            **extra_context,
+        )
+
+
+class Projection:
+    def __init__(self, *columns):
+        self.keys = [key for key, _ in columns]
+        self.fields = [field for _, field in columns]
+
+    def rows(self, queryset):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in queryset.values_list(*self.fields)]
+
+
+class ProjectionListMixin:
+    projection = None
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        return Response(self.projection.rows(self.filter_queryset(self.get_queryset())))
+
+
+TASK_ON_TIME = Case(
+    When(Q(completed_at__isnull=True) | Q(deadline__isnull=True), then=Value(None)),
+    When(completed_at__date__lte=F('deadline'), then=Value(True)),
+    default=Value(False),
+    output_field=BooleanField(),
+)
+
+TIME_WORKED = Case(
+    When(clock_out__isnull=True, then=Value(None)),
+    default=Cast(Round(HoursBetween('clock_out', 'clock_in'), 2), FloatField()),
+    output_field=FloatField(),
+)
+
+TASK_PROJECTION = Projection(
+    ('id', 'id'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('employee', 'employee__username'),
+    ('created_by', 'created_by__username'),
+    ('deadline', 'deadline'),
+    ('completed_at', 'completed_at'),
+    ('status', 'status'),
+    ('created_at', 'created_at'),
+    ('on_time', TASK_ON_TIME),
+    ('priority', 'priority'),
+    ('version', 'version'),
+)
+
+ATTENDANCE_PROJECTION = Projection(
+    ('id', 'id'),
+    ('employee', 'employee__username'),
+    ('clock_in', 'clock_in'),
+    ('clock_out', 'clock_out'),
+    ('date', 'date'),
+    ('time_worked', TIME_WORKED),
+)
+
+USER_PROJECTION = Projection(
+    ('id', 'id'),
+    ('username', 'username'),
+    ('email', 'email'),
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('role', 'role'),
+    ('supervisor', 'supervisor_id'),
+)
+
+RATING_PROJECTION = Projection(
+    ('id', 'id'),
+    ('task', 'task_id'),
+    ('rated_by', 'rated_by__username'),
+    ('comment', 'comment'),
+    ('rating', 'rating'),
+    ('created_at', 'created_at'),
+)
@@ -0,0 +1,62 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+
+def _default(obj):
+    # the types DRF's JSONEncoder handles that orjson doesn't natively
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):  # numpy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # OPT_UTC_Z matches DRF's "Z" suffix for UTC datetimes
+        return orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+class CompactJSONRenderer(ORJSONRenderer):
+    # column-oriented lists for large payloads: one shared header instead of
+    # repeated keys per row, and repeated strings (status, priority, usernames)
+    # sent once per column with the values holding indexes into them.
+    # Selected with ?format=compact or Accept: application/vnd.pmp.compact+json
+    media_type = 'application/vnd.pmp.compact+json'
+    format = 'compact'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list) and data and isinstance(data[0], dict):
+            data = self.to_columns(data)
+        return super().render(data, accepted_media_type, renderer_context)
+
+    def to_columns(self, rows):
+        columns = list(rows[0])
+        values = []
+        dictionaries = {}
+        for column in columns:
+            column_values = [row[column] for row in rows]
+            distinct = set(column_values) - {None}
+            if distinct and len(distinct) * 2 <= len(column_values) and all(isinstance(v, str) for v in distinct):
+                dictionary = sorted(distinct)
+                index = {value: i for i, value in enumerate(dictionary)}
+                column_values = [None if v is None else index[v] for v in column_values]
+                dictionaries[column] = dictionary
+            values.append(column_values)
+        return {"columns": columns, "dictionaries": dictionaries, "values": values, "count": len(rows)}
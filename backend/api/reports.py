@@ -0,0 +1,353 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, OuterRef, Q, Subquery, Value, Window
+from django.db.models.functions import Cast, Coalesce, CumeDist, NullIf, Rank
+from django.utils import timezone
+
+from . import deadlines
+from .models import Attendance, OrgClosure, Rating, Task, User
+
+RANKING_METRICS = ('on_time_rate', 'average_rating', 'throughput')
+RANKING_WINDOW_DAYS = 30
+RANKING_PAGE_SIZE = 50
+
+# roles whose dashboards are cached and warmed ahead of time
+DASHBOARD_ROLES = ('supervisor', 'admin')
+
+# rankings for periods that ended before today rarely change, so keep them a
+# day; the key carries the dashboard version, so a late rating or a team move
+# still shows up on the next load
+CLOSED_PERIOD_TIMEOUT = 60 * 60 * 24
+OPEN_PERIOD_TIMEOUT = 60 * 5
+
+
+def _per_employee(queryset, aggregate):
+    return Subquery(
+        queryset.filter(employee=OuterRef('pk'))
+        .order_by()
+        .values('employee')
+        .annotate(value=aggregate)
+        .values('value')[:1]
+    )
+
+
+def employee_rankings(employees, start, end, order_by='average_rating'):
+    # one statement: per-employee metrics as correlated aggregates, ranked
+    # with window functions so the database does the sorting
+    completed = Task.objects.filter(
+        status='completed',
+        completed_at__date__gte=start,
+        completed_at__date__lte=end,
+    )
+    ratings = Rating.objects.filter(
+        task__employee=OuterRef('pk'),
+        created_at__date__gte=start,
+        created_at__date__lte=end,
+    ).order_by().values('task__employee').annotate(value=Avg('rating')).values('value')[:1]
+
+    queryset = employees.annotate(
+        throughput=Coalesce(_per_employee(completed, Count('pk')), 0),
+        on_time=Coalesce(
+            _per_employee(completed, Count('pk', filter=Q(deadline__isnull=False, completed_at__date__lte=F('deadline')))),
+            0,
+        ),
+        average_rating=Subquery(ratings, output_field=FloatField()),
+    ).annotate(
+        on_time_rate=Cast(F('on_time'), FloatField()) * Value(100.0) / NullIf(Cast(F('throughput'), FloatField()), Value(0.0)),
+    )
+
+    windows = {}
+    for metric in RANKING_METRICS:
+        windows[f'{metric}_rank'] = Window(Rank(), order_by=F(metric).desc(nulls_last=True))
+        # share of the team at or below this score, so tied leaders all sit at 100
+        windows[f'{metric}_percentile'] = Window(CumeDist(), order_by=F(metric).asc(nulls_first=True))
+
+    return queryset.annotate(**windows).order_by(f'{order_by}_rank', 'pk')
+
+
+def ranking_row(employee):
+    row = {
+        "id": employee.id,
+        "username": employee.username,
+        "full_name": f"{employee.first_name} {employee.last_name}".strip() or employee.username,
+        "throughput": employee.throughput,
+        "on_time_rate": round(employee.on_time_rate, 1) if employee.on_time_rate is not None else None,
+        "average_rating": round(employee.average_rating, 1) if employee.average_rating is not None else None,
+    }
+    for metric in RANKING_METRICS:
+        cume_dist = getattr(employee, metric + '_percentile')
+        row[metric + '_rank'] = getattr(employee, metric + '_rank')
+        row[metric + '_percentile'] = round(cume_dist * 100, 1)
+        row[metric + '_quartile'] = 1 + min(3, int((1 - cume_dist) * 4))  # 1 is the top quartile
+    return row
+
+
+def dashboard_scope(user):
+    # supervisors see their own subtree, every admin sees the same org-wide data
+    return f"supervisor:{user.id}" if user.role == 'supervisor' else "all"
+
+
+def ranking_employees(user):
+    if user.role == 'supervisor':
+        return User.objects.filter(role='employee', id__in=OrgClosure.objects.below(user))
+    return User.objects.filter(role='employee')
+
+
+def default_ranking_window(today):
+    return today - timedelta(days=RANKING_WINDOW_DAYS - 1), today
+
+
+def rankings_payload(employees, start, end, metric, offset, limit):
+    ranked = employee_rankings(employees, start, end, order_by=metric)
+    return {
+        "metric": metric,
+        "start": start,
+        "end": end,
+        "count": employees.count(),
+        "offset": offset,
+        "limit": limit,
+        "results": [ranking_row(employee) for employee in ranked[offset:offset + limit]],
+    }
+
+
+def rankings_key(scope, start, end, metric, offset, limit):
+    return f"rankings:{scope}:{dashboard_version(scope)}:{start}:{end}:{metric}:{offset}:{limit}"
+
+
+def rankings_timeout(end):
+    return CLOSED_PERIOD_TIMEOUT if end < timezone.now().date() else OPEN_PERIOD_TIMEOUT
+
+
+def cached_rankings(scope, start, end, metric, offset, limit, compute):
+    key = rankings_key(scope, start, end, metric, offset, limit)
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, rankings_timeout(end))
+    return result
+
+
+def report_attendance():
+    # ATTENDANCE_REPORT_DAYS bounds the attendance figures to recent days,
+    # which on a partitioned table reads only the latest partitions
+    if not settings.ATTENDANCE_REPORT_DAYS:
+        return Attendance.objects.all()
+    return Attendance.objects.filter(date__gte=timezone.now().date() - timedelta(days=settings.ATTENDANCE_REPORT_DAYS - 1))
+
+
+def report_scope(user):
+    # the querysets behind a user's own report; None for unknown roles
+    if user.role == 'employee':
+        return (
+            report_attendance().filter(employee=user),
+            Task.objects.filter(employee=user),
+            Rating.objects.filter(task__employee=user),
+            None,
+        )
+    if user.role == 'supervisor':
+        team = OrgClosure.objects.subtree(user)
+        return (
+            report_attendance().filter(team_supervisor__in=team),
+            Task.objects.filter(team_supervisor__in=team),
+            Rating.objects.filter(team_supervisor__in=team),
+            User.objects.filter(role='employee', id__in=OrgClosure.objects.below(user)),
+        )
+    if user.role == 'admin':
+        return (
+            report_attendance(),
+            Task.objects.all(),
+            Rating.objects.all(),
+            User.objects.filter(role='employee'),
+        )
+    return None
+
+
+def build_report(attendances, tasks, ratings, employees=None):
+    # Attendance percentage 
+    total_attendance = attendances.count()
+    present_count = attendances.filter(clock_in__isnull=False).count()
+    attendance_percent = round((present_count / total_attendance * 100), 1) if total_attendance > 0 else 0
+
+    # On-time tasks percentage
+    finished_tasks = tasks.filter(status='completed')
+    on_time_count = 0
+    for task in finished_tasks:
+        if task.completed_at and task.deadline and task.completed_at.date() <= task.deadline:
+            on_time_count += 1
+    on_time_percent = round((on_time_count / finished_tasks.count() * 100), 1) if finished_tasks.count() > 0 else 0
+
+    # Average rating 
+    total_rating = 0
+    rating_count = 0
+    for r in ratings:
+        total_rating += r.rating
+        rating_count += 1
+    average_rating = round(total_rating / rating_count, 1) if rating_count > 0 else 0
+
+    result = {
+        "attendance_percent": attendance_percent,
+        "on_time_percent": on_time_percent,
+        "average_rating": average_rating,
+        "total_tasks": tasks.count(),
+        "completed_tasks": finished_tasks.count(),
+    }
+
+    if employees is not None:
+        employee_stats = []
+        for emp in employees:
+            emp_tasks = tasks.filter(employee=emp)
+            emp_completed = emp_tasks.filter(status='completed')
+            emp_on_time = 0
+            for t in emp_completed:
+                if t.completed_at and t.deadline and t.completed_at.date() <= t.deadline:
+                    emp_on_time += 1
+
+            emp_ratings = ratings.filter(task__employee=emp)
+            emp_total = 0
+            emp_count = 0
+            for r in emp_ratings:
+                emp_total += r.rating
+                emp_count += 1
+            emp_avg = round(emp_total / emp_count, 1) if emp_count > 0 else 0
+
+            employee_stats.append({
+                "id": emp.id,
+                "username": emp.username,
+                "full_name": f"{emp.first_name} {emp.last_name}".strip() or emp.username,
+                "attendance_percent": 0,  
+                "on_time_percent": round((emp_on_time / emp_completed.count() * 100), 1) if emp_completed.count() > 0 else 0,
+                "average_rating": emp_avg,
+                "total_tasks": emp_tasks.count(),
+                "completed_tasks": emp_completed.count(),
+            })
+
+        result["employees"] = employee_stats
+
+
+    return result
+
+
+# Cached dashboards (reports, alerts and rankings) are keyed by version
+# tokens, so a write shows up on the next load instead of when the entry
+# expires. Task and rating writes replace the tokens of every supervisor above
+# the employee and of the org-wide scope; team moves replace the shared "*"
+# token, which is part of every key. Old entries are simply never read again.
+# Attendance writes leave them alone: every row has a clock-in, so clocking in
+# or out moves no figure the dashboards show and the morning rush keeps its
+# warmed entries.
+VERSION_PREFIX = 'dashboard-version'
+
+
+def dashboard_version(scope):
+    keys = [f"{VERSION_PREFIX}:*", f"{VERSION_PREFIX}:{scope}"]
+    versions = cache.get_many(keys)
+    if len(versions) < len(keys):
+        for key in keys:
+            cache.add(key, uuid.uuid4().hex[:12], None)
+        versions = cache.get_many(keys)
+    return '.'.join(versions[key] for key in keys)
+
+
+def _bump(scopes):
+    cache.set_many({f"{VERSION_PREFIX}:{scope}": uuid.uuid4().hex[:12] for scope in scopes}, None)
+
+
+def dashboard_changed(employee_ids):
+    # after commit, so a reload right after the write rebuilds from it
+    employee_ids = {employee_id for employee_id in employee_ids if employee_id}
+
+    def bump():
+        ancestors = OrgClosure.objects.filter(descendant__in=employee_ids, depth__gt=0).values_list('ancestor_id', flat=True)
+        _bump({'all', *(f"supervisor:{ancestor}" for ancestor in set(ancestors))})
+
+    if employee_ids:
+        transaction.on_commit(bump)
+
+
+def org_changed():
+    transaction.on_commit(lambda: _bump({'*'}))
+
+
+def report_key(user):
+    scope = dashboard_scope(user)
+    return f"dashboard:report:{scope}:{dashboard_version(scope)}"
+
+
+def cached_report(user):
+    key = report_key(user)
+    result = cache.get(key)
+    if result is None:
+        result = build_report(*report_scope(user))
+        cache.set(key, result, settings.DASHBOARD_CACHE_SECONDS)
+    return result
+
+
+def notification_alerts(user, today):
+    alerts = []
+
+    if user.role == 'employee':
+        # deadline reminders (3 days or less), soonest first
+        for task in deadlines.between(deadlines.upcoming(user.id), today, today + timedelta(days=3)):
+            days_left = (task['deadline'] - today).days
+            alerts.append({
+                "title": "Task Deadline Approaching",
+                "message": f"Task '{task['title']}' is due in {days_left} day{'s' if days_left != 1 else ''}!",
+                "task_id": task['id'],
+                "days_left": days_left,
+                "read": False
+            })
+
+    elif user.role == 'supervisor':
+        # pending ratings
+        team_tasks = Task.objects.filter(team_supervisor__in=OrgClosure.objects.subtree(user), status='completed')
+
+        for task in team_tasks:
+            if not task.task_ratings.filter(rated_by=user).exists():
+                employee_name = task.employee.username
+                alerts.append({
+                    "title": "Pending Task Rating",
+                    "message": f"Rate task '{task.title}' for {employee_name}",
+                    "task_id": task.id,
+                    "read": False
+                })
+
+    return alerts
+
+
+def alerts_key(user_id):
+    return f"dashboard:alerts:{user_id}:{dashboard_version(f'supervisor:{user_id}')}"
+
+
+def cached_alerts(user, today):
+    # only supervisors' alerts are worth caching
+    if user.role != 'supervisor':
+        return notification_alerts(user, today)
+    key = alerts_key(user.id)
+    alerts = cache.get(key)
+    if alerts is None:
+        alerts = notification_alerts(user, today)
+        cache.set(key, alerts, settings.DASHBOARD_CACHE_SECONDS)
+    return alerts
+
+
+def dashboard_entries(user, today):
+    # everything a supervisor/admin dashboard loads by default, as
+    # (cache key, payload, timeout) for the warming job
+    entries = [(report_key(user), build_report(*report_scope(user)), settings.DASHBOARD_CACHE_SECONDS)]
+    if user.role == 'supervisor':
+        entries.append((alerts_key(user.id), notification_alerts(user, today), settings.DASHBOARD_CACHE_SECONDS))
+
+    start, end = default_ranking_window(today)
+    employees = ranking_employees(user)
+    scope = dashboard_scope(user)
+    for metric in RANKING_METRICS:
+        entries.append((
+            rankings_key(scope, start, end, metric, 0, RANKING_PAGE_SIZE),
+            rankings_payload(employees, start, end, metric, 0, RANKING_PAGE_SIZE),
+            rankings_timeout(end),
+        ))
+    return entries
@@ -0,0 +1,67 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Reads go to a replica only inside views that opt in with ReplicaReadMixin,
+# and only for users who haven't written within REPLICA_PIN_SECONDS, so a
+# clock-in followed by an attendance list always reads its own write.
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def _pin_key(user_id):
+    return f"db-pin:{user_id}"
+
+
+def pin_to_primary(user):
+    if settings.DATABASE_REPLICAS and user.is_authenticated:
+        cache.set(_pin_key(user.id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(_pin_key(user.id), False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+
+class ReplicaReadMixin:
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if settings.DATABASE_REPLICAS and request.method in SAFE_METHODS and not is_pinned(request.user):
+            self._replica_token = replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # DRF copies the JWT-authenticated user onto the underlying request
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None:
+                pin_to_primary(user)
+        return response
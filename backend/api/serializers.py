@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import User, Attendance, Task, Rating, User
+from .models import User, Attendance, OrgClosure, Task, Rating
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -29,6 +29,11 @@ class UserSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Invalid role")
         return value
 
+    def validate_supervisor(self, value):
+        if value and self.instance and OrgClosure.objects.filter(ancestor=self.instance, descendant=value).exists():
+            raise serializers.ValidationError("A user cannot report to someone in their own team.")
+        return value
+
     def create(self, validated_data):
         password = validated_data.pop('password', None)
         supervisor = validated_data.pop('supervisor', None)
@@ -110,9 +115,9 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = [
             'id', 'title', 'description', 'employee', 'employee_id', 'created_by', 
-            'deadline', 'completed_at', 'status', 'created_at', 'on_time', 'priority'
+            'deadline', 'completed_at', 'status', 'created_at', 'on_time', 'priority', 'version'
         ]
-        read_only_fields = ['id', 'created_by','created_at', 'on_time', 'status', 'completed_at']
+        read_only_fields = ['id', 'created_by','created_at', 'on_time', 'status', 'completed_at', 'version']
 
     def get_employee(self, obj):
         if not obj.employee:
@@ -143,6 +148,17 @@ class RatingSerializer(serializers.ModelSerializer):
         fields = ['id', 'task', 'rated_by', 'comment', 'rating', 'created_at']
         read_only_fields = ['rated_by', 'created_at']
 
+class BulkRatingItemSerializer(serializers.Serializer):
+    # plain ids: the view checks every task in one query
+    task = serializers.IntegerField()
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+    comment = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class BulkRatingSerializer(serializers.Serializer):
+    ratings = serializers.ListField(child=BulkRatingItemSerializer(), min_length=1, max_length=500)
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
@@ -0,0 +1,89 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import deadlines
+from .models import Attendance, Rating, Task, Tombstone, User
+from .reports import dashboard_changed, org_changed
+from .workload import index as workload
+
+
+@receiver(pre_delete, sender=User)
+def detach_reports(sender, instance, **kwargs):
+    # SET_NULL on supervisor is a plain UPDATE, so move the direct reports
+    # out through save() to keep the org closure and team columns in step
+    for employee in instance.employees.all():
+        employee.supervisor = None
+        employee.save(update_fields=['supervisor'])
+
+
+@receiver(post_delete, sender=User)
+def log_user_delete(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model='user', object_id=instance.pk,
+        employee_id=instance.pk, team_supervisor_id=instance.supervisor_id,
+    )
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Attendance)
+def log_delete(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model=sender._meta.model_name, object_id=instance.pk,
+        employee_id=instance.employee_id, team_supervisor_id=instance.team_supervisor_id,
+    )
+
+
+@receiver(post_delete, sender=Rating)
+def log_rating_delete(sender, instance, **kwargs):
+    from . import calibration
+    # ratings go before their task in a cascade, so the task is still there
+    employee_id = Task.objects.filter(pk=instance.task_id).values_list('employee_id', flat=True).first()
+    Tombstone.objects.create(
+        model='rating', object_id=instance.pk,
+        employee_id=employee_id, team_supervisor_id=instance.team_supervisor_id,
+    )
+    calibration.forget(instance, employee_id)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def update_workload(sender, instance, **kwargs):
+    # a reassigned task changes the load of both employees
+    workload.task_changed(instance.employee_id, getattr(instance, '_loaded_employee_id', None))
+
+
+@receiver(post_save, sender=Task)
+def update_deadlines(sender, instance, **kwargs):
+    deadlines.task_changed(instance)
+
+
+@receiver(post_delete, sender=Task)
+def drop_from_deadlines(sender, instance, **kwargs):
+    deadlines.task_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=User)
+def update_workload_teams(sender, instance, created, **kwargs):
+    # User.save() updates _loaded_supervisor_id only after this runs
+    if created or getattr(instance, '_loaded_supervisor_id', instance.supervisor_id) != instance.supervisor_id:
+        workload.team_changed()
+        org_changed()
+
+
+@receiver(post_delete, sender=User)
+def drop_from_workload(sender, instance, **kwargs):
+    workload.team_changed()
+    org_changed()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def refresh_dashboards(sender, instance, **kwargs):
+    dashboard_changed({instance.employee_id, getattr(instance, '_loaded_employee_id', None)})
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def refresh_rating_dashboards(sender, instance, **kwargs):
+    # a new rating also drops the task off the supervisor's pending ratings
+    dashboard_changed(Task.objects.filter(pk=instance.task_id).values_list('employee_id', flat=True))
@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Attendance, OrgClosure, Rating, Task, Tombstone, User
+from .projections import ATTENDANCE_PROJECTION, RATING_PROJECTION, TASK_PROJECTION, USER_PROJECTION
+
+# Delta sync for client-side caches. A cursor is the time of the previous
+# sync minus SYNC_COMMIT_LAG, so a row saved by a transaction that was still
+# open at that moment is picked up on the next pass; clients upsert by id, so
+# the few rows sent twice are harmless. Deleted rows come back as ids from the
+# Tombstone log, which is kept for SYNC_TOMBSTONE_DAYS; an older cursor gets a
+# full snapshot with "reset": true.
+#
+# A team move bumps updated_at on every row of the moved subtree, so rows
+# entering the caller's scope arrive with the next delta, and tombstones them
+# for the old supervisor's chain, so rows leaving it are dropped. Ids still in
+# the caller's scope are filtered out of "deleted" when read.
+#
+# A response holds at most SYNC_PAGE_SIZE rows and ids, walking the
+# collections and then the tombstones in (updated_at, id) order. While
+# "has_more" is true, "cursor" is null and "next" is passed back as ?page=
+# for the rest; the last page carries the cursor for the following sync.
+
+COLLECTIONS = (
+    ('tasks', 'task', TASK_PROJECTION),
+    ('attendance', 'attendance', ATTENDANCE_PROJECTION),
+    ('ratings', 'rating', RATING_PROJECTION),
+    ('users', 'user', USER_PROJECTION),
+)
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+# cursors are epoch microseconds, so they need no escaping in a query string
+def encode_cursor(moment):
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+
+def decode_cursor(cursor):
+    return EPOCH + timedelta(microseconds=int(cursor))
+
+
+def _scoped(user):
+    if user.role == 'employee':
+        return {
+            'tasks': Task.objects.filter(employee=user),
+            'attendance': Attendance.objects.filter(employee=user),
+            'ratings': Rating.objects.filter(task__employee=user),
+            'users': User.objects.filter(id=user.id),
+        }, Tombstone.objects.filter(employee_id=user.id)
+    if user.role == 'supervisor':
+        team = OrgClosure.objects.subtree(user)
+        return {
+            'tasks': Task.objects.filter(team_supervisor__in=team),
+            'attendance': Attendance.objects.filter(team_supervisor__in=team),
+            'ratings': Rating.objects.filter(team_supervisor__in=team),
+            'users': User.objects.filter(role='employee', id__in=OrgClosure.objects.below(user)),
+        }, Tombstone.objects.filter(team_supervisor_id__in=team)
+    if user.role == 'admin':
+        return {
+            'tasks': Task.objects.all(),
+            'attendance': Attendance.objects.all(),
+            'ratings': Rating.objects.all(),
+            'users': User.objects.all(),
+        }, Tombstone.objects.all()
+    return None
+
+
+def encode_page(cursor, since, index, after):
+    moment, pk = after if after is not None else ('', '')
+    return '.'.join([
+        encode_cursor(cursor), '' if since is None else encode_cursor(since), str(index),
+        '' if moment == '' else encode_cursor(moment), str(pk),
+    ])
+
+
+def decode_page(page):
+    cursor, since, index, moment, pk = page.split('.')
+    index = int(index)
+    if not 0 <= index <= len(COLLECTIONS):
+        raise ValueError(page)
+    return (
+        decode_cursor(cursor),
+        decode_cursor(since) if since else None,
+        index,
+        (decode_cursor(moment), int(pk)) if moment else None,
+    )
+
+
+def _after(queryset, field, after):
+    moment, pk = after
+    return queryset.filter(Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'pk__gt': pk}))
+
+
+def _unscoped(querysets, tombstones):
+    # a row that only left some other scope is still the caller's
+    deleted = {name: [] for name, _, _ in COLLECTIONS}
+    names = {model: name for name, model, _ in COLLECTIONS}
+    for model, object_id in tombstones:
+        deleted[names[model]].append(object_id)
+    for name, ids in deleted.items():
+        if ids:
+            present = set(querysets[name].filter(id__in=ids).values_list('id', flat=True))
+            deleted[name] = [object_id for object_id in ids if object_id not in present]
+    return deleted
+
+
+def changes(user, since=None, page=None):
+    scoped = _scoped(user)
+    if scoped is None:
+        return None
+    querysets, tombstones = scoped
+
+    if page is not None:
+        cursor, since, start, after = page
+        reset = False
+    else:
+        now = timezone.now()
+        if since is not None and since < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+            # tombstones that old are pruned, start the client over
+            since = None
+        cursor, start, after, reset = now - settings.SYNC_COMMIT_LAG, 0, None, since is None
+
+    # (name, queryset, time column, projection); the tombstones go last
+    sources = [(name, querysets[name], 'updated_at', projection) for name, _, projection in COLLECTIONS]
+    if since is not None:
+        sources.append((None, tombstones, 'deleted_at', None))
+
+    result = {name: [] for name, _, _ in COLLECTIONS}
+    removed = []
+    budget, following = settings.SYNC_PAGE_SIZE, None
+    for index in range(start, len(sources)):
+        if not budget:
+            following = (index, None)
+            break
+        name, queryset, field, projection = sources[index]
+        if since is not None:
+            queryset = queryset.filter(**{f'{field}__gte': since})
+        if index == start and after is not None:
+            queryset = _after(queryset, field, after)
+        fields = projection.fields if projection else ['model', 'object_id']
+        rows = list(queryset.order_by(field, 'pk').values_list(*fields, field, 'pk')[:budget + 1])
+        if len(rows) > budget:
+            rows = rows[:budget]
+            following = (index, rows[-1][-2:])
+        if projection:
+            result[name] = [dict(zip(projection.keys, row[:-2])) for row in rows]
+        else:
+            removed = [row[:2] for row in rows]
+        budget -= len(rows)
+        if following:
+            break
+
+    result["deleted"] = _unscoped(querysets, removed)
+    result.update({
+        "cursor": None if following else encode_cursor(cursor),
+        "has_more": following is not None,
+        "next": encode_page(cursor, since, *following) if following else None,
+        "reset": reset,
+    })
+    return result
+
+
+def prune(before=None):
+    before = before or timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=before).delete()
+    return deleted
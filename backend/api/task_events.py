@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import EventCursor, Task, TaskEvent, TaskStatusStat
+
+CURSOR_NAME = 'task_status_stats'
+
+# events newer than this are left for the next pass, so an event whose
+# transaction commits after a later id was consumed is never skipped
+COMMIT_LAG = timedelta(seconds=10)
+
+HISTOGRAM_BUCKETS = (
+    ('<1h', timedelta(hours=1)),
+    ('1-4h', timedelta(hours=4)),
+    ('4-24h', timedelta(days=1)),
+    ('1-3d', timedelta(days=3)),
+    ('3-7d', timedelta(days=7)),
+    ('7-30d', timedelta(days=30)),
+)
+OVERFLOW_BUCKET = '30d+'
+
+
+def bucket_for(duration):
+    for label, limit in HISTOGRAM_BUCKETS:
+        if duration < limit:
+            return label
+    return OVERFLOW_BUCKET
+
+
+def consume(batch_size=1000):
+    with transaction.atomic():
+        cursor, _ = EventCursor.objects.get_or_create(name=CURSOR_NAME)
+        # lock the cursor row so concurrent consumers can't apply a batch twice
+        cursor = EventCursor.objects.select_for_update().get(pk=cursor.pk)
+        events = list(
+            TaskEvent.objects.filter(id__gt=cursor.position, at__lt=timezone.now() - COMMIT_LAG)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        keys = {(e.employee_id, e.to_status) for e in events}
+        keys |= {(e.employee_id, e.from_status) for e in events if e.from_status}
+        lookup = Q()
+        for employee_id, status in keys:
+            lookup |= Q(employee_id=employee_id, status=status)
+        stats = {(s.employee_id, s.status): s for s in TaskStatusStat.objects.filter(lookup)}
+        new = {}
+        for key in keys - stats.keys():
+            new[key] = stats[key] = TaskStatusStat(employee_id=key[0], status=key[1])
+
+        for event in events:
+            stats[(event.employee_id, event.to_status)].entered += 1
+            if event.from_status:
+                stat = stats[(event.employee_id, event.from_status)]
+                stat.exited += 1
+                if event.from_status_since:
+                    duration = event.at - event.from_status_since
+                    stat.seconds_in_status += int(duration.total_seconds())
+                    label = bucket_for(duration)
+                    stat.histogram[label] = stat.histogram.get(label, 0) + 1
+
+        TaskStatusStat.objects.bulk_create(new.values())
+        TaskStatusStat.objects.bulk_update(
+            [s for key, s in stats.items() if key not in new],
+            ['entered', 'exited', 'seconds_in_status', 'histogram'],
+        )
+        cursor.position = events[-1].id
+        cursor.save(update_fields=['position', 'updated_at'])
+    return len(events)
+
+
+def mark_overdue(batch_size=1000, today=None):
+    # set-based overdue sweep: one UPDATE and one bulk insert of events per
+    # batch, in the same transaction, instead of Task.save() per row
+    today = today or timezone.now().date()
+    total = 0
+    while True:
+        with transaction.atomic():
+            tasks = list(
+                Task.objects.select_for_update()
+                .filter(completed_at__isnull=True, deadline__lt=today)
+                .exclude(status='overdue')
+                .values_list('id', 'employee_id', 'status', 'status_changed_at')[:batch_size]
+            )
+            if not tasks:
+                return total
+            now = timezone.now()
+            Task.objects.filter(id__in=[t[0] for t in tasks]).update(
+                status='overdue', status_changed_at=now, updated_at=now, version=F('version') + 1,
+            )
+            TaskEvent.objects.bulk_create([
+                TaskEvent(task_id=task_id, employee_id=employee_id, from_status=status,
+                          to_status='overdue', from_status_since=since, at=now)
+                for task_id, employee_id, status, since in tasks
+            ])
+        total += len(tasks)
+
+
+def status_summary(stats):
+    summary = {}
+    for stat in stats:
+        entry = summary.setdefault(stat.status, {'entered': 0, 'exited': 0, 'seconds': 0, 'histogram': {}})
+        entry['entered'] += stat.entered
+        entry['exited'] += stat.exited
+        entry['seconds'] += stat.seconds_in_status
+        for label, count in stat.histogram.items():
+            entry['histogram'][label] = entry['histogram'].get(label, 0) + count
+
+    labels = [label for label, _ in HISTOGRAM_BUCKETS] + [OVERFLOW_BUCKET]
+    return {
+        status: {
+            'entered': entry['entered'],
+            'exited': entry['exited'],
+            'average_hours_in_status': round(entry['seconds'] / entry['exited'] / 3600, 2) if entry['exited'] else None,
+            'histogram': {label: entry['histogram'].get(label, 0) for label in labels},
+        }
+        for status, entry in summary.items()
+    }
@@ -1,3 +1,490 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import deadlines
+from .models import Attendance, DeadlineBucket, OrgClosure, Rating, Task, TaskEvent, User
+from .workload import index as workload
+
+
+def make_user(username, role='employee', supervisor=None):
+    # no password: tests authenticate directly and hashing is slow
+    return User.objects.create(username=username, role=role, supervisor=supervisor)
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        # throttle buckets, dashboard versions and deadline lists live in the
+        # cache; the workload index is per process
+        cache.clear()
+        workload.seeded_at = None
+        self.client = APIClient()
+
+    def login(self, user):
+        self.client.force_authenticate(user)
+
+
+class TaskVersionTests(TestCase):
+    def setUp(self):
+        self.supervisor = User.objects.create_user(username='sup', password='pass', role='supervisor')
+        self.employee = User.objects.create_user(username='emp', password='pass', role='employee', supervisor=self.supervisor)
+        self.task = Task.objects.create(title='Report', employee=self.employee, created_by=self.supervisor)
+        self.url = f'/api/tasks/{self.task.pk}/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.supervisor)
+
+    def patch(self, data, **headers):
+        return self.client.patch(self.url, data, format='json', headers=headers)
+
+    def test_get_sets_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], '"1"')
+
+    def test_if_match_current_version(self):
+        response = self.patch({'title': 'Q3 report'}, if_match='"1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"2"')
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.version), ('Q3 report', 2))
+
+    def test_weak_and_bare_etags(self):
+        self.assertEqual(self.patch({'title': 'A'}, if_match='W/"1"').status_code, 200)
+        self.assertEqual(self.patch({'title': 'B'}, if_match='2').status_code, 200)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.version), ('B', 3))
+
+    def test_if_match_any(self):
+        Task.objects.filter(pk=self.task.pk).update(version=5)
+        response = self.patch({'title': 'Q3 report'}, if_match='*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"6"')
+
+    def test_body_version(self):
+        self.assertEqual(self.patch({'title': 'Q3 report', 'version': 1}).status_code, 200)
+        self.assertEqual(self.patch({'title': 'Q4 report', 'version': 1}).status_code, 409)
+
+    def test_stale_version_conflicts(self):
+        self.patch({'title': 'Q3 report'}, if_match='"1"')
+        response = self.patch({'title': 'Q4 report', 'deadline': '2999-01-01'}, if_match='"1"')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['current']['title'], 'Q3 report')
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.deadline, self.task.version), ('Q3 report', None, 2))
+
+    def test_invalid_if_match(self):
+        self.assertEqual(self.patch({'title': 'Q3 report'}, if_match='"abc"').status_code, 400)
+        self.assertEqual(self.patch({'title': 'Q3 report', 'version': 'abc'}).status_code, 400)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.version, 1)
+
+    def test_employee_completes_with_if_match(self):
+        self.client.force_authenticate(self.employee)
+        response = self.patch({'completed_at': True}, if_match='"1"')
+        self.assertEqual(response.status_code, 200)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.status, self.task.version), ('completed', 2))
+        self.assertEqual(TaskEvent.objects.filter(task=self.task, to_status='completed').count(), 1)
+
+    def test_stale_completion_writes_nothing(self):
+        self.patch({'title': 'Q3 report'}, if_match='"1"')
+        self.client.force_authenticate(self.employee)
+        response = self.patch({'completed_at': True}, if_match='"1"')
+        self.assertEqual(response.status_code, 409)
+        # the status change and its event go with the rejected write
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.status, self.task.completed_at, self.task.version), ('in_progress', None, 2))
+        self.assertFalse(TaskEvent.objects.filter(task=self.task, to_status='completed').exists())
+
+
+class ClockInOutTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.supervisor = make_user('sup', 'supervisor')
+        self.employee = make_user('emp', supervisor=self.supervisor)
+        self.login(self.employee)
+
+    def test_clock_in_once_per_day(self):
+        response = self.client.post('/api/clock-in/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.post('/api/clock-in/').status_code, 400)
+        attendance = Attendance.objects.get(employee=self.employee)
+        self.assertEqual(attendance.team_supervisor_id, self.supervisor.id)
+        self.assertIsNone(attendance.clock_out)
+
+    def test_clock_out_closes_todays_row_once(self):
+        self.client.post('/api/clock-in/')
+        response = self.client.post('/api/clock-out/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.data['clock_out'])
+        self.assertIsNotNone(Attendance.objects.get(employee=self.employee).clock_out)
+        self.assertEqual(self.client.post('/api/clock-out/').status_code, 400)
+
+    def test_clock_out_without_clock_in(self):
+        self.assertEqual(self.client.post('/api/clock-out/').status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_supervisors_cannot_clock_in(self):
+        self.login(self.supervisor)
+        self.assertEqual(self.client.post('/api/clock-in/').status_code, 403)
+
+
+class OrgClosureTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.top = make_user('top', 'supervisor')
+        self.mid = make_user('mid', 'supervisor', self.top)
+        self.other = make_user('other', 'supervisor', self.top)
+        self.employee = make_user('emp', supervisor=self.mid)
+        self.task = Task.objects.create(title='Report', employee=self.employee, created_by=self.mid)
+
+    def paths(self, user):
+        return set(OrgClosure.objects.filter(descendant=user).values_list('ancestor__username', 'depth'))
+
+    def visible(self, supervisor):
+        self.login(supervisor)
+        return [row['id'] for row in self.client.get('/api/tasks/').data]
+
+    def test_paths_to_every_ancestor(self):
+        self.assertEqual(self.paths(self.employee), {('emp', 0), ('mid', 1), ('top', 2)})
+
+    def test_supervisors_see_their_whole_subtree(self):
+        self.assertEqual(self.visible(self.top), [self.task.id])
+        self.assertEqual(self.visible(self.mid), [self.task.id])
+        self.assertEqual(self.visible(self.other), [])
+
+    def test_moving_an_employee_moves_their_rows(self):
+        self.employee.supervisor = self.other
+        self.employee.save()
+        self.assertEqual(self.paths(self.employee), {('emp', 0), ('other', 1), ('top', 2)})
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.team_supervisor_id, self.other.id)
+        self.assertEqual(self.visible(self.mid), [])
+        self.assertEqual(self.visible(self.other), [self.task.id])
+
+    def test_moving_a_supervisor_moves_their_subtree(self):
+        self.mid.supervisor = self.other
+        self.mid.save()
+        self.assertEqual(self.paths(self.employee), {('emp', 0), ('mid', 1), ('other', 2), ('top', 3)})
+        self.assertEqual(self.visible(self.other), [self.task.id])
+
+    def test_cannot_report_into_own_subtree(self):
+        self.top.supervisor = self.mid
+        with self.assertRaises(ValidationError):
+            self.top.save()
+
+    def test_deleting_a_supervisor_detaches_their_reports(self):
+        self.mid.delete()
+        self.employee.refresh_from_db()
+        self.assertIsNone(self.employee.supervisor_id)
+        self.assertEqual(self.paths(self.employee), {('emp', 0)})
+        self.assertEqual(self.visible(self.top), [])
+
+
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.supervisor = make_user('sup', 'supervisor')
+        self.employee = make_user('emp', supervisor=self.supervisor)
+
+    def post(self, user, key, title='Report'):
+        # the middleware scopes keys by the JWT user, before DRF authenticates
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.client.post('/api/tasks/', {'title': title, 'employee_id': self.employee.id}, format='json', headers=headers)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post(self.supervisor, 'k1')
+        retry = self.post(self.supervisor, 'k1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.post(self.supervisor, 'k1')
+        self.assertEqual(self.post(self.supervisor, 'k1', title='Other').status_code, 422)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        admin = make_user('admin', 'admin')
+        self.post(self.supervisor, 'k1')
+        response = self.post(admin, 'k1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_without_a_key_every_post_runs(self):
+        self.post(self.supervisor, None)
+        self.post(self.supervisor, None)
+        self.assertEqual(Task.objects.count(), 2)
+
+
+@override_settings(SYNC_COMMIT_LAG=timedelta(0))
+class SyncTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.top = make_user('top', 'supervisor')
+        self.mid = make_user('mid', 'supervisor', self.top)
+        self.other = make_user('other', 'supervisor', self.top)
+        self.employee = make_user('emp', supervisor=self.mid)
+        self.task = Task.objects.create(title='Report', employee=self.employee, created_by=self.mid)
+        self.untouched = Task.objects.create(title='Slides', employee=self.employee, created_by=self.mid)
+
+    def sync(self, user, **params):
+        self.login(user)
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_reset_sends_everything_in_scope(self):
+        data = self.sync(self.mid)
+        self.assertTrue(data['reset'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual({row['id'] for row in data['tasks']}, {self.task.id, self.untouched.id})
+        self.assertEqual([row['id'] for row in data['users']], [self.employee.id])
+        self.assertEqual(self.sync(self.other)['tasks'], [])
+
+    def test_delta_sends_changes_and_deletions(self):
+        cursor = self.sync(self.mid)['cursor']
+        self.task.title = 'Q3 report'
+        self.task.save()
+        deleted_id = self.untouched.id
+        self.untouched.delete()
+        data = self.sync(self.mid, since=cursor)
+        self.assertFalse(data['reset'])
+        self.assertEqual([row['title'] for row in data['tasks']], ['Q3 report'])
+        self.assertEqual(data['deleted']['tasks'], [deleted_id])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_pages_until_has_more_is_false(self):
+        for n in range(3):
+            Task.objects.create(title=f'Task {n}', employee=self.employee, created_by=self.mid)
+        data, seen, pages = self.sync(self.top), [], 1
+        while data['has_more']:
+            self.assertIsNone(data['cursor'])
+            seen += [row['id'] for row in data['tasks']]
+            data, pages = self.sync(self.top, page=data['next']), pages + 1
+        seen += [row['id'] for row in data['tasks']]
+        self.assertIsNotNone(data['cursor'])
+        self.assertEqual(sorted(seen), sorted(Task.objects.values_list('id', flat=True)))
+        self.assertGreater(pages, 2)
+
+    def test_team_move_tombstones_rows_for_the_old_team_only(self):
+        cursors = {user.id: self.sync(user)['cursor'] for user in (self.top, self.mid, self.other)}
+        self.employee.supervisor = self.other
+        self.employee.save()
+
+        old = self.sync(self.mid, since=cursors[self.mid.id])
+        self.assertEqual(set(old['deleted']['tasks']), {self.task.id, self.untouched.id})
+        self.assertEqual(old['deleted']['users'], [self.employee.id])
+        new = self.sync(self.other, since=cursors[self.other.id])
+        self.assertEqual({row['id'] for row in new['tasks']}, {self.task.id, self.untouched.id})
+        self.assertEqual(new['deleted']['tasks'], [])
+        # still in the shared manager's scope, so nothing to drop there
+        self.assertEqual(self.sync(self.top, since=cursors[self.top.id])['deleted']['tasks'], [])
+
+    def test_invalid_cursor_or_page(self):
+        self.login(self.mid)
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/', {'page': '1.2'}).status_code, 400)
+
+
+class SuggestAssigneeTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.supervisor = make_user('sup', 'supervisor')
+        self.busy = make_user('busy', supervisor=self.supervisor)
+        self.light = make_user('light', supervisor=self.supervisor)
+        self.idle = make_user('idle', supervisor=self.supervisor)
+        self.outsider = make_user('outsider', supervisor=make_user('sup2', 'supervisor'))
+        Task.objects.create(title='Big', priority='high', employee=self.busy, created_by=self.supervisor)
+        Task.objects.create(title='Small', priority='low', employee=self.light, created_by=self.supervisor)
+        Task.objects.create(title='Done', priority='high', employee=self.idle, created_by=self.supervisor,
+                            completed_at=timezone.now())
+        self.login(self.supervisor)
+
+    def suggest(self, limit=3):
+        response = self.client.get('/api/tasks/suggest-assignee/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return [(row['username'], row['open_load']) for row in response.data['suggestions']]
+
+    def test_least_loaded_first_within_the_team(self):
+        # completed tasks carry no load; the other team is never offered
+        self.assertEqual(self.suggest(), [('idle', 0), ('light', 1), ('busy', 3)])
+
+    def test_tie_goes_to_the_later_nearest_deadline(self):
+        # light's task has no deadline at all, so it is the least urgent
+        Task.objects.create(title='Soon', priority='low', employee=self.idle, created_by=self.supervisor,
+                            deadline=timezone.now().date() + timedelta(days=1))
+        self.assertEqual(self.suggest(2), [('light', 1), ('idle', 1)])
+
+    def test_new_tasks_update_the_index_after_commit(self):
+        self.suggest()
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Huge', priority='high', employee=self.idle, created_by=self.supervisor)
+            Task.objects.create(title='Huge too', priority='high', employee=self.idle, created_by=self.supervisor)
+        self.assertEqual(self.suggest(), [('light', 1), ('busy', 3), ('idle', 6)])
+
+    def test_least_loaded_assignment_on_create(self):
+        response = self.client.post('/api/tasks/', {'title': 'New', 'assignment': 'least_loaded'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.get(title='New').employee, self.idle)
+
+
+class BulkRatingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.supervisor = make_user('sup', 'supervisor')
+        self.employee = make_user('emp', supervisor=self.supervisor)
+        outsider = make_user('outsider', supervisor=make_user('sup2', 'supervisor'))
+        done = {'completed_at': timezone.now(), 'created_by': self.supervisor}
+        self.done = Task.objects.create(title='Done', employee=self.employee, **done)
+        self.rated = Task.objects.create(title='Rated', employee=self.employee, **done)
+        self.open = Task.objects.create(title='Open', employee=self.employee, created_by=self.supervisor)
+        self.foreign = Task.objects.create(title='Foreign', employee=outsider, **done)
+        Rating.objects.create(task=self.rated, rated_by=self.supervisor, rating=3)
+        self.login(self.supervisor)
+
+    def rate(self, *task_ids):
+        items = [{'task': task_id, 'rating': 4} for task_id in task_ids]
+        return self.client.post('/api/ratings/bulk/', {'ratings': items}, format='json')
+
+    def test_rates_what_it_can_and_explains_the_rest(self):
+        response = self.rate(self.done.id, self.done.id, self.rated.id, self.open.id, self.foreign.id, 999999)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['task'] for row in response.data['created']], [self.done.id])
+        self.assertEqual({row['task']: row['detail'] for row in response.data['skipped']}, {
+            self.done.id: "You have already rated this task.",
+            self.rated.id: "You have already rated this task.",
+            self.open.id: "Task must be completed before rating.",
+            self.foreign.id: "Task not found or not in your team.",
+            999999: "Task not found or not in your team.",
+        })
+        self.assertEqual(Rating.objects.get(task=self.done).team_supervisor_id, self.supervisor.id)
+
+    def test_nothing_to_rate(self):
+        response = self.rate(self.rated.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], [])
+        self.assertEqual(Rating.objects.count(), 1)
+
+    def test_admins_rate_any_team(self):
+        self.login(make_user('admin', 'admin'))
+        self.assertEqual(len(self.rate(self.foreign.id).data['created']), 1)
+
+    def test_employees_cannot_bulk_rate(self):
+        self.login(self.employee)
+        self.assertEqual(self.rate(self.done.id).status_code, 403)
+
+
+THROTTLE_BUCKETS = {'login_ip': (20, 1), 'login_user': (1, 0.001), 'register_ip': (5, 1), 'write_user': (2, 0.001)}
+
+
+@override_settings(THROTTLE_BUCKETS=THROTTLE_BUCKETS)
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.supervisor = make_user('sup', 'supervisor')
+        self.employee = make_user('emp', supervisor=self.supervisor)
+
+    def create_task(self, **headers):
+        return self.client.post('/api/tasks/', {'title': 'Report', 'employee_id': self.employee.id}, format='json', headers=headers)
+
+    def test_writes_run_out_of_tokens(self):
+        self.login(self.supervisor)
+        self.assertEqual([self.create_task().status_code for _ in range(3)], [201, 201, 429])
+        self.assertIn('Retry-After', self.create_task())
+        # reads take no tokens
+        self.assertEqual(self.client.get('/api/tasks/').status_code, 200)
+
+    def test_login_is_limited_per_username(self):
+        credentials = {'username': 'Emp', 'password': 'wrong'}
+        self.assertEqual(self.client.post('/api/token/', credentials, format='json').status_code, 401)
+        self.assertEqual(self.client.post('/api/token/', {**credentials, 'username': 'emp '}, format='json').status_code, 429)
+
+    def test_throttled_keyed_post_is_not_replayed(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.supervisor).access_token}')
+        self.create_task()
+        self.create_task()
+        self.assertEqual(self.create_task(**{'Idempotency-Key': 'k1'}).status_code, 429)
+        cache.delete(f'throttle:write_user:{self.supervisor.pk}')
+        response = self.create_task(**{'Idempotency-Key': 'k1'})
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    @override_settings(CONCURRENCY_LIMITS={'reports': 0, 'sync': 1}, CONCURRENCY_QUEUE_TIMEOUT=0)
+    def test_busy_reports_leave_sync_alone(self):
+        self.login(self.supervisor)
+        response = self.client.get('/api/reports/')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.get('/api/sync/').status_code, 200)
+
+
+class DeadlineTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.now().date()
+        self.supervisor = make_user('sup', 'supervisor')
+        self.employee = make_user('emp', supervisor=self.supervisor)
+        self.other = make_user('other', supervisor=self.supervisor)
+
+    def task(self, employee, days, **fields):
+        # buckets and lists are refreshed after commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return Task.objects.create(title='Task', employee=employee, created_by=self.supervisor,
+                                       deadline=self.today + timedelta(days=days), **fields)
+
+    def buckets(self):
+        return {(e, (d - self.today).days): n for e, d, n in DeadlineBucket.objects.values_list('employee_id', 'deadline', 'open_count')}
+
+    def upcoming(self, user, **params):
+        self.login(user)
+        response = self.client.get('/api/tasks/upcoming/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_buckets_follow_task_changes(self):
+        moved = self.task(self.employee, 2)
+        self.task(self.employee, 2)
+        done = self.task(self.other, 5)
+        self.assertEqual(self.buckets(), {(self.employee.id, 2): 2, (self.other.id, 5): 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.deadline = self.today + timedelta(days=4)
+            moved.save()
+            done.completed_at = timezone.now()
+            done.save()
+        self.assertEqual(self.buckets(), {(self.employee.id, 2): 1, (self.employee.id, 4): 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.delete()
+        incremental = self.buckets()
+        deadlines.rebuild()
+        self.assertEqual(incremental, self.buckets())
+
+    def test_employee_window_and_calendar(self):
+        self.task(self.employee, -1)
+        self.task(self.employee, 1)
+        self.task(self.employee, 10)
+        data = self.upcoming(self.employee, days=7)
+        self.assertEqual((data['overdue_count'], data['due_count']), (1, 1))
+        self.assertEqual([(task['deadline'] - self.today).days for task in data['tasks']], [1])
+
+        # the cached list is dropped when one of its tasks changes
+        self.task(self.employee, 3)
+        self.assertEqual(self.upcoming(self.employee, days=7)['due_count'], 2)
+
+    def test_supervisor_counts_cover_the_team(self):
+        self.task(self.employee, -2)
+        self.task(self.employee, 1)
+        self.task(self.other, 1)
+        self.task(self.other, 2, completed_at=timezone.now())
+        data = self.upcoming(self.supervisor, days=7)
+        self.assertEqual((data['overdue_count'], data['due_count']), (1, 2))
+        self.assertEqual([((row['date'] - self.today).days, row['count']) for row in data['calendar']], [(1, 2)])
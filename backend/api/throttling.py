@@ -0,0 +1,169 @@
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+# Load protection in two parts:
+#
+#   token buckets  each scope in THROTTLE_BUCKETS is (burst, refill per
+#                  second); a request takes one token from its IP's or user's
+#                  bucket and gets a 429 with Retry-After when it's empty
+#   concurrency    views with ConcurrencyLimitMixin share a few slots per pool
+#                  across all workers (CONCURRENCY_LIMITS); a request waits up
+#                  to CONCURRENCY_QUEUE_TIMEOUT seconds for one, then gets a
+#                  503 with Retry-After instead of tying up another worker
+#
+# Both live in the cache, so every worker counts against the same numbers
+# with REDIS_URL set; the local-memory fallback limits each process alone.
+
+# refill, then take one token; returns how many milliseconds until one is
+# available (0 = taken). Redis' own clock keeps every worker consistent.
+BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = math.min(capacity, (tonumber(state[1]) or capacity) + (now - (tonumber(state[2]) or now)) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return wait
+"""
+POLL_INTERVAL = 0.05
+
+_bucket_lock = threading.Lock()
+
+
+def take_token(key, burst, rate):
+    # seconds until the bucket has a token for this request, 0 if it had one
+    ttl = math.ceil(burst / rate) + 1
+    if isinstance(cache, RedisCache):
+        key = cache.make_and_validate_key(key)
+        client = cache._cache.get_client(key, write=True)
+        return client.eval(BUCKET_SCRIPT, 1, key, burst, rate, ttl) / 1000
+
+    # other backends have no atomic read-modify-write; this is exact for the
+    # per-process local-memory cache
+    with _bucket_lock:
+        now = time.time()
+        tokens, stamp = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - stamp) * rate)
+        wait = 0 if tokens >= 1 else (1 - tokens) / rate
+        cache.set(key, (tokens - 1 if wait == 0 else tokens, now), ttl)
+        return wait
+
+
+class BucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_key(self, request):
+        # None lets the request through unthrottled
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        key = self.get_key(request)
+        if key is None:
+            return True
+        burst, rate = settings.THROTTLE_BUCKETS[self.scope]
+        self.wait_seconds = take_token(f"throttle:{self.scope}:{key}", burst, rate)
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LoginIPThrottle(BucketThrottle):
+    scope = 'login_ip'
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+class LoginUserThrottle(BucketThrottle):
+    # credential stuffing spreads over many IPs but keeps hitting the same accounts
+    scope = 'login_user'
+
+    def get_key(self, request):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+
+class RegisterIPThrottle(BucketThrottle):
+    scope = 'register_ip'
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+class WriteUserThrottle(BucketThrottle):
+    # every authenticated write; anonymous ones have their own throttles above
+    scope = 'write_user'
+
+    def get_key(self, request):
+        if request.method in SAFE_METHODS or not request.user.is_authenticated:
+            return None
+        return request.user.pk
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The server is busy, please retry shortly."
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        # the exception handler turns this into Retry-After
+        self.wait = wait
+
+
+def acquire_slot(pool):
+    # one of CONCURRENCY_LIMITS[pool] cache keys; cache.add is atomic, and the
+    # TTL frees slots held by workers that died mid-request
+    limit = settings.CONCURRENCY_LIMITS[pool]
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.CONCURRENCY_QUEUE_TIMEOUT
+    while True:
+        for number in range(limit):
+            key = f"concurrency:{pool}:{number}"
+            if cache.add(key, token, settings.CONCURRENCY_SLOT_TTL):
+                return key, token
+        if time.monotonic() >= deadline:
+            raise Overloaded(max(1, math.ceil(settings.CONCURRENCY_QUEUE_TIMEOUT)))
+        time.sleep(POLL_INTERVAL)
+
+
+def release_slot(slot):
+    key, token = slot
+    # don't free a slot that expired and was taken by someone else
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+class ConcurrencyLimitMixin:
+    concurrency_pool = 'reports'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # after authentication and throttling, so rejected requests never queue
+        self._concurrency_slot = acquire_slot(self.concurrency_pool)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        slot = getattr(self, '_concurrency_slot', None)
+        if slot is not None:
+            release_slot(slot)
+            self._concurrency_slot = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -2,9 +2,11 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     RegisterView, CustomTokenObtainPairView,
-    ClockInView, ClockOutView, TaskListCreateView, TaskDetailView,
-    RatingCreateView, AttendanceListView, ReportView, NotificationsView,
-    UserListView,UserDetailView, MeView, BootstrapAdminView
+    ClockInView, ClockOutView, TaskListCreateView, TaskDetailView, SuggestAssigneeView, UpcomingTasksView,
+    RatingCreateView, BulkRatingCreateView, AttendanceListView, ReportView, RankingsView, TaskStatusAnalyticsView,
+    AttendanceAnalyticsView, RatingCalibrationView, NotificationsView, SyncView,
+    UserListView,UserDetailView, MeView, BootstrapAdminView,
+    DatabasePoolStatsView, PasswordHashStatsView,
 )
 
 urlpatterns = [
@@ -15,12 +17,22 @@ urlpatterns = [
     path('clock-out/', ClockOutView.as_view(), name='clock_out'),
     path('tasks/', TaskListCreateView.as_view(), name='task_list_create'),
     path('tasks/<int:pk>/', TaskDetailView.as_view(), name='task_detail'),
+    path('tasks/suggest-assignee/', SuggestAssigneeView.as_view(), name='task_suggest_assignee'),
+    path('tasks/upcoming/', UpcomingTasksView.as_view(), name='task_upcoming'),
     path('ratings/', RatingCreateView.as_view(), name='rating_create'),
+    path('ratings/bulk/', BulkRatingCreateView.as_view(), name='rating_bulk_create'),
     path('attendance/', AttendanceListView.as_view(), name='attendance_list'),
     path('reports/', ReportView.as_view(), name='reports'),
+    path('reports/rankings/', RankingsView.as_view(), name='report_rankings'),
+    path('reports/attendance/', AttendanceAnalyticsView.as_view(), name='report_attendance'),
+    path('reports/calibration/', RatingCalibrationView.as_view(), name='report_calibration'),
+    path('reports/task-status/', TaskStatusAnalyticsView.as_view(), name='report_task_status'),
     path('notifications/', NotificationsView.as_view(), name='notifications'),
+    path('sync/', SyncView.as_view(), name='sync'),
     path('users/', UserListView.as_view(), name='user_list'),
     path('users/<int:pk>/', UserDetailView.as_view(), name='user_detail'),
     path('me/', MeView.as_view(), name='me'),
-    path('bootstrap-admin/', BootstrapAdminView.as_view(), name='bootstrap-admin')
+    path('bootstrap-admin/', BootstrapAdminView.as_view(), name='bootstrap-admin'),
+    path('metrics/db-pool/', DatabasePoolStatsView.as_view(), name='db_pool_stats'),
+    path('metrics/password-hashing/', PasswordHashStatsView.as_view(), name='password_hash_stats'),
 ]
\ No newline at end of file
@@ -4,16 +4,30 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import (
     RegisterSerializer, UserSerializer, AttendanceSerializer,
-    TaskSerializer, RatingSerializer, CustomTokenObtainPairSerializer,
+    TaskSerializer, RatingSerializer, BulkRatingSerializer, CustomTokenObtainPairSerializer,
+)
+from rest_framework.exceptions import ParseError, PermissionDenied
+from .models import Attendance, OrgClosure, Task, TaskStatusStat, Rating, User
+from . import attendance_queue, deadlines, hashing, sync
+from .workload import index as workload
+from .task_events import status_summary
+from .routers import ReplicaReadMixin
+from .throttling import ConcurrencyLimitMixin, LoginIPThrottle, LoginUserThrottle, RegisterIPThrottle
+from .renderers import CompactJSONRenderer
+from .projections import ATTENDANCE_PROJECTION, TASK_PROJECTION, USER_PROJECTION, ProjectionListMixin
+from .reports import (
+    DASHBOARD_ROLES, RANKING_METRICS, RANKING_PAGE_SIZE, build_report, cached_alerts, cached_rankings,
+    cached_report, dashboard_changed, dashboard_scope, default_ranking_window, ranking_employees, rankings_payload, report_attendance,
+    report_scope,
 )
-from rest_framework.exceptions import PermissionDenied
-from .models import Attendance, Task, Rating, User
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, time, timedelta
 from rest_framework.generics import ListCreateAPIView
+from rest_framework.settings import api_settings
 from django.core.exceptions import ValidationError
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connections, transaction
 
 
 
@@ -27,6 +41,12 @@ class IsAdminOrSupervisor(permissions.BasePermission):
         return request.user.is_authenticated and request.user.role in ['supervisor', 'admin']
     
 
+def manages(user, employee_id, supervisor_id):
+    # supervisors manage everyone below them in the org tree; direct reports
+    # need no lookup, deeper ones are a single closure-table probe
+    return supervisor_id == user.id or OrgClosure.objects.is_below(user, employee_id)
+
+
 class IsEmployee(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
@@ -37,6 +57,7 @@ class IsEmployee(permissions.BasePermission):
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [RegisterIPThrottle]
 
 class MeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -48,34 +69,55 @@ class MeView(APIView):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    # password hashing is the most expensive thing an anonymous caller can trigger
+    throttle_classes = [LoginIPThrottle, LoginUserThrottle]
 
 class ClockInView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsEmployee]
 
     def post(self, request):
-        today = timezone.now().date()
-        if Attendance.objects.filter(employee=request.user, date=today).exists():
+        if attendance_queue.enabled():
+            now = timezone.now()
+            # the journal is per host, so a clock-in already drained or taken
+            # on another host is only visible in the table
+            already = Attendance.objects.filter(employee=request.user, date=now.date()).exists()
+            if already or not attendance_queue.record(attendance_queue.CLOCK_IN, request.user.id, now):
+                return Response({"detail": "Already clocked in today."}, status=status.HTTP_400_BAD_REQUEST)
+            attendance = Attendance(employee=request.user, clock_in=now, date=now.date())
+            return Response(AttendanceSerializer(attendance).data, status=status.HTTP_202_ACCEPTED)
+
+        attendance = Attendance.objects.clock_in(request.user)
+        if attendance is None:
             return Response({"detail": "Already clocked in today."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        attendance = Attendance.objects.create(employee=request.user)
+
+        attendance.employee = request.user
         return Response(AttendanceSerializer(attendance).data, status=status.HTTP_201_CREATED)
     
 class ClockOutView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsEmployee]
 
     def post(self, request):
-        today = timezone.now().date()
-        try:
-            attendance = Attendance.objects.get(employee=request.user, date=today, clock_out__isnull=True)
-            attendance.clock_out = timezone.now()
-            attendance.save()
-            return Response(AttendanceSerializer(attendance).data)
-        except Attendance.DoesNotExist:
+        now = timezone.now()
+        # clock-ins still waiting in the journal can only be closed through it
+        clocked_in = attendance_queue.enabled() and attendance_queue.event_time(attendance_queue.CLOCK_IN, request.user.id, now.date())
+        if clocked_in:
+            if not attendance_queue.record(attendance_queue.CLOCK_OUT, request.user.id, now):
+                return Response({"detail": "Clock_in not found."}, status=status.HTTP_400_BAD_REQUEST)
+            attendance = Attendance(employee=request.user, clock_in=clocked_in, clock_out=now, date=now.date())
+            return Response(AttendanceSerializer(attendance).data, status=status.HTTP_202_ACCEPTED)
+
+        attendance = Attendance.objects.clock_out(request.user, now)
+        if attendance is None:
             return Response({"detail": "Clock_in not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        attendance.employee = request.user
+        return Response(AttendanceSerializer(attendance).data)
         
 
-class TaskListCreateView(generics.ListCreateAPIView):
+class TaskListCreateView(ReplicaReadMixin, ProjectionListMixin, generics.ListCreateAPIView):
     serializer_class = TaskSerializer
+    projection = TASK_PROJECTION
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CompactJSONRenderer]
     permission_classes = [permissions.IsAuthenticated]
 
 
@@ -84,7 +126,7 @@ class TaskListCreateView(generics.ListCreateAPIView):
         if user.role == 'employee':
             return Task.objects.filter(employee=user) # employee can only access their tasks
         elif user.role == 'supervisor':
-            return Task.objects.filter(employee__supervisor=user) # supervisor can access their teams tasks
+            return Task.objects.filter(team_supervisor__in=OrgClosure.objects.subtree(user)) # supervisor can access their teams tasks
         elif user.role == 'admin':
             return Task.objects.all() # admins can see all tasks
         return Task.objects.none()
@@ -99,6 +141,11 @@ class TaskListCreateView(generics.ListCreateAPIView):
         elif user.role in ['supervisor', 'admin']:
             # supervisor/admin must provide employee id in task creation
             employee_id = self.request.data.get('employee_id')
+            if not employee_id and self.request.data.get('assignment') == 'least_loaded':
+                suggestions = workload.suggest(assignable_teams(user))
+                if not suggestions:
+                    raise ValidationError({"employee": "No employee available for assignment."})
+                employee_id = suggestions[0]['id']
             if not employee_id:
                 raise ValidationError({"employee": "This field is required when assigning tasks."})
             try:
@@ -110,9 +157,77 @@ class TaskListCreateView(generics.ListCreateAPIView):
         else:
             raise PermissionDenied("You cannot create tasks.")
 
+def assignable_teams(user):
+    # None means every team
+    if user.role == 'admin':
+        return None
+    return set(User.objects.filter(id__in=OrgClosure.objects.subtree(user)).values_list('id', flat=True))
+
+
+class SuggestAssigneeView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrSupervisor]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 3)), 1), 20)
+        except ValueError:
+            return Response({"detail": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        suggestions = workload.suggest(assignable_teams(request.user), limit)
+        usernames = dict(User.objects.filter(id__in=[s['id'] for s in suggestions]).values_list('id', 'username'))
+        for suggestion in suggestions:
+            suggestion['username'] = usernames.get(suggestion['id'])
+        return Response({"suggestions": suggestions})
+
+
+class UpcomingTasksView(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        today = timezone.now().date()
+        try:
+            days = min(max(int(request.query_params.get('days', 7)), 0), 366)
+            start = date.fromisoformat(request.query_params['start']) if 'start' in request.query_params else today
+            end = date.fromisoformat(request.query_params['end']) if 'end' in request.query_params else today + timedelta(days=days)
+        except ValueError:
+            return Response({"detail": "Invalid days, start or end."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # due_count covers today through today + days; calendar covers start..end
+        if user.role == 'employee':
+            entries = deadlines.upcoming(user.id)
+            result = deadlines.list_summary(entries, today, days, start, end)
+            result["tasks"] = deadlines.between(entries, today, today + timedelta(days=days))
+        elif user.role == 'supervisor':
+            result = deadlines.bucket_summary(OrgClosure.objects.below(user), today, days, start, end)
+        else:
+            result = deadlines.bucket_summary(None, today, days, start, end)
+
+        return Response({"today": today, "days": days, "start": start, "end": end, **result})
+
+
+def requested_version(request):
+    # the version the client last read: If-Match ("3", W/"3" or bare, as in
+    # our ETag), else "version" in the body; None when it sent neither
+    header = request.headers.get('If-Match', '').strip()
+    if header == '*':
+        return None
+    if header:
+        return int(header.removeprefix('W/').strip('"'))
+    if hasattr(request.data, 'get') and request.data.get('version') is not None:
+        return int(request.data['version'])
+    return None
+
+
+def with_etag(response, task):
+    response['ETag'] = f'"{task.version}"'
+    return response
+
+
 class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):  
     serializer_class = TaskSerializer
-    queryset = Task.objects.all()
+    # the serializer and Task.save() read both users
+    queryset = Task.objects.select_related('employee', 'created_by')
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
@@ -120,35 +235,64 @@ class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
         user = self.request.user
 
         # Everyone can read their own or supervised tasks
-        if user.role == 'employee' and obj.employee != user:
+        if user.role == 'employee' and obj.employee_id != user.id:
             raise PermissionDenied("Not authorized to access this task")
-        if user.role == 'supervisor' and obj.employee.supervisor != user:
+        if user.role == 'supervisor' and not manages(user, obj.employee_id, obj.team_supervisor_id):
             raise PermissionDenied("Not authorized to access this task")
 
         return obj
 
-    def perform_update(self, serializer):
+    def retrieve(self, request, *args, **kwargs):
         task = self.get_object()
-        user = self.request.user
+        return with_etag(Response(self.get_serializer(task).data), task)
 
-        if user.role == 'employee':
-            # employees can only complete their own tasks
-            if 'completed_at' in self.request.data:
-                now = timezone.now()
-                task.completed_at = now
-                task.status = 'completed'
-                task.save(update_fields=['completed_at', 'status'])
-                return Response(TaskSerializer(task).data)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in ('PUT', 'PATCH'):
+            # update() holds the row until commit; of=self so the nullable
+            # created_by join isn't locked with it
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
+
+    def update(self, request, *args, **kwargs):
+        # the task is fetched locked, checked against the version the client
+        # read (or, without If-Match, the one just fetched) and written once,
+        # so the version bump, the changed columns and the TaskEvent commit
+        # together or not at all
+        user = request.user
+        try:
+            expected = requested_version(request)
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid If-Match or version."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            task = self.get_object()
+            if expected is not None and expected != task.version:
+                return Response({
+                    "detail": "This task was changed by someone else. Reload it and try again.",
+                    "current": self.get_serializer(task).data,
+                }, status=status.HTTP_409_CONFLICT)
+
+            if user.role == 'employee':
+                # employees can only complete their own tasks
+                if 'completed_at' not in request.data:
+                    raise PermissionDenied("Employees can only mark tasks as completed.")
+                changes = {'completed_at': timezone.now(), 'status': 'completed'}
+            elif user.role in ['supervisor', 'admin']:
+                # supervisors/admins can fully update
+                serializer = self.get_serializer(task, data=request.data, partial=kwargs.get('partial', False))
+                serializer.is_valid(raise_exception=True)
+                changes = {field: value for field, value in serializer.validated_data.items() if getattr(task, field) != value}
             else:
-                raise PermissionDenied("Employees can only mark tasks as completed.")
+                raise PermissionDenied("Not authorized to update this task.")
 
-        elif user.role in ['supervisor', 'admin']:
-            # supervisors/admins can fully update
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data)
+            if changes:
+                for field, value in changes.items():
+                    setattr(task, field, value)
+                task.version += 1
+                task.save(update_fields=[*changes, 'version'])
 
-        raise PermissionDenied("Not authorized to update this task.")
+        return with_etag(Response(self.get_serializer(task).data), task)
 
     def perform_destroy(self, instance):
         user = self.request.user
@@ -167,7 +311,7 @@ class RatingCreateView(generics.CreateAPIView):
         task = serializer.validated_data['task']
         user = self.request.user
 
-        if task.employee.supervisor != self.request.user and self.request.user.role != 'admin':
+        if self.request.user.role != 'admin' and not manages(self.request.user, task.employee_id, task.team_supervisor_id):
             raise PermissionDenied("You can only rate your team's tasks.")
         if task.status != 'completed':
             raise PermissionDenied("Task must be completed before rating.")
@@ -178,8 +322,64 @@ class RatingCreateView(generics.CreateAPIView):
         serializer.save(rated_by=self.request.user )
 
 
-class AttendanceListView(generics.ListAPIView):
+class BulkRatingCreateView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrSupervisor]
+
+    def post(self, request):
+        serializer = BulkRatingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['ratings']
+        user = request.user
+        task_ids = {item['task'] for item in items}
+
+        # one query authorizes every task, one more finds those already rated
+        tasks = Task.objects.filter(id__in=task_ids)
+        if user.role != 'admin':
+            tasks = tasks.filter(team_supervisor__in=OrgClosure.objects.subtree(user))
+        tasks = {task_id: (task_status, team_supervisor_id, employee_id) for task_id, task_status, team_supervisor_id, employee_id
+                 in tasks.values_list('id', 'status', 'team_supervisor_id', 'employee_id')}
+        rated = set(Rating.objects.filter(rated_by=user, task_id__in=tasks).values_list('task_id', flat=True))
+
+        ratings, skipped, seen = [], [], set()
+        for item in items:
+            task_id = item['task']
+            if task_id not in tasks:
+                reason = "Task not found or not in your team."
+            elif tasks[task_id][0] != 'completed':
+                reason = "Task must be completed before rating."
+            elif task_id in rated or task_id in seen:
+                reason = "You have already rated this task."
+            else:
+                seen.add(task_id)
+                ratings.append(Rating(
+                    task_id=task_id, rated_by=user, rating=item['rating'], comment=item['comment'],
+                    team_supervisor_id=tasks[task_id][1],
+                ))
+                continue
+            skipped.append({"task": task_id, "detail": reason})
+
+        try:
+            with transaction.atomic():
+                Rating.objects.bulk_create(ratings)
+        except IntegrityError:
+            return Response(
+                {"detail": "Some of these tasks were rated by you in the meantime; please retry."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if ratings:
+            # bulk_create sends no post_save
+            dashboard_changed({tasks[rating.task_id][2] for rating in ratings})
+
+        return Response(
+            {"created": RatingSerializer(ratings, many=True).data, "skipped": skipped},
+            status=status.HTTP_201_CREATED if ratings else status.HTTP_200_OK,
+        )
+
+
+class AttendanceListView(ReplicaReadMixin, ProjectionListMixin, generics.ListAPIView):
     serializer_class = AttendanceSerializer
+    projection = ATTENDANCE_PROJECTION
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CompactJSONRenderer]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -196,22 +396,33 @@ class AttendanceListView(generics.ListAPIView):
             except User.DoesNotExist:
                 raise ValidationError("Employee not found")
 
-            if user.role == 'supervisor' and target.supervisor != user:
+            if user.role == 'supervisor' and not manages(user, target.id, target.supervisor_id):
                 raise PermissionDenied("Not authorized to view this employee")
 
-            return Attendance.objects.filter(employee=target).order_by('-date')
+            return self.in_range(Attendance.objects.filter(employee=target)).order_by('-date')
 
         else:
             if user.role == 'employee':
-                return Attendance.objects.filter(employee=user).order_by('-date')
+                return self.in_range(Attendance.objects.filter(employee=user)).order_by('-date')
             elif user.role == 'supervisor':
-                return Attendance.objects.filter(employee__supervisor=user).order_by('-date')
+                return self.in_range(Attendance.objects.filter(team_supervisor__in=OrgClosure.objects.subtree(user))).order_by('-date')
             elif user.role == 'admin':
-                return Attendance.objects.all().order_by('-date')
+                return self.in_range(Attendance.objects.all()).order_by('-date')
             return Attendance.objects.none()
+
+    def in_range(self, queryset):
+        # ?start=/?end= let a partitioned table skip the months outside them
+        try:
+            if 'start' in self.request.query_params:
+                queryset = queryset.filter(date__gte=date.fromisoformat(self.request.query_params['start']))
+            if 'end' in self.request.query_params:
+                queryset = queryset.filter(date__lte=date.fromisoformat(self.request.query_params['end']))
+        except ValueError:
+            raise ParseError("start and end must be YYYY-MM-DD dates")
+        return queryset
     
 
-class ReportView(APIView):
+class ReportView(ConcurrencyLimitMixin, ReplicaReadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
@@ -229,138 +440,144 @@ class ReportView(APIView):
                 return Response({"detail": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
 
             # supervisor can only view their own team
-            if user.role == 'supervisor' and target_employee.supervisor != user:
+            if user.role == 'supervisor' and not manages(user, target_employee.id, target_employee.supervisor_id):
                 return Response({"detail": "Not authorized to view this employee"}, status=status.HTTP_403_FORBIDDEN)
 
-            attendances = Attendance.objects.filter(employee=target_employee)
-            tasks = Task.objects.filter(employee=target_employee)
-            ratings = Rating.objects.filter(task__employee=target_employee)
+            return Response(build_report(
+                report_attendance().filter(employee=target_employee),
+                Task.objects.filter(employee=target_employee),
+                Rating.objects.filter(task__employee=target_employee),
+            ))
 
-            # clear employee list when viewing one person
-            employees = []
+        # supervisor and admin dashboards are served from the cache that
+        # `manage.py warm_dashboard_cache` fills ahead of time
+        if user.role in DASHBOARD_ROLES:
+            return Response(cached_report(user))
 
-        else:
-            if user.role == 'employee':
-                attendances = Attendance.objects.filter(employee=user)
-                tasks = Task.objects.filter(employee=user)
-                ratings = Rating.objects.filter(task__employee=user)
-                employees = []
+        scope = report_scope(user)
+        if scope is None:
+            return Response({"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
+        return Response(build_report(*scope))
 
-            elif user.role == 'supervisor':
-                attendances = Attendance.objects.filter(employee__supervisor=user)
-                tasks = Task.objects.filter(employee__supervisor=user)
-                ratings = Rating.objects.filter(task__employee__supervisor=user)
-                employees = User.objects.filter(role='employee', supervisor=user)
+class RankingsView(ConcurrencyLimitMixin, ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrSupervisor]
 
-            elif user.role == 'admin':
-                attendances = Attendance.objects.all()
-                tasks = Task.objects.all()
-                ratings = Rating.objects.all()
-                employees = User.objects.filter(role='employee')
+    def get(self, request):
+        user = request.user
+        metric = request.query_params.get('metric', 'average_rating')
+        if metric not in RANKING_METRICS:
+            return Response({"detail": f"metric must be one of {', '.join(RANKING_METRICS)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-            else:
-                return Response({"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            end = date.fromisoformat(request.query_params['end']) if 'end' in request.query_params else timezone.now().date()
+            start = date.fromisoformat(request.query_params['start']) if 'start' in request.query_params else default_ranking_window(end)[0]
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', RANKING_PAGE_SIZE)), 1), 500)
+        except ValueError:
+            return Response({"detail": "Invalid start, end, offset or limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # supervisors rank their own team, admins the whole org
+        employees = ranking_employees(user)
+        return Response(cached_rankings(
+            dashboard_scope(user), start, end, metric, offset, limit,
+            lambda: rankings_payload(employees, start, end, metric, offset, limit),
+        ))
+
+
+class AttendanceAnalyticsView(ConcurrencyLimitMixin, ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrSupervisor]
 
-        # Attendance percentage 
-        total_attendance = attendances.count()
-        present_count = attendances.filter(clock_in__isnull=False).count()
-        attendance_percent = round((present_count / total_attendance * 100), 1) if total_attendance > 0 else 0
-
-        # On-time tasks percentage
-        finished_tasks = tasks.filter(status='completed')
-        on_time_count = 0
-        for task in finished_tasks:
-            if task.completed_at and task.deadline and task.completed_at.date() <= task.deadline:
-                on_time_count += 1
-        on_time_percent = round((on_time_count / finished_tasks.count() * 100), 1) if finished_tasks.count() > 0 else 0
-
-        # Average rating 
-        total_rating = 0
-        rating_count = 0
-        for r in ratings:
-            total_rating += r.rating
-            rating_count += 1
-        average_rating = round(total_rating / rating_count, 1) if rating_count > 0 else 0
-
-        result = {
-            "attendance_percent": attendance_percent,
-            "on_time_percent": on_time_percent,
-            "average_rating": average_rating,
-            "total_tasks": tasks.count(),
-            "completed_tasks": finished_tasks.count(),
-        }
-
-        if not employee_id and user.role in ['supervisor', 'admin']:
-            employee_stats = []
-            for emp in employees:
-                emp_tasks = tasks.filter(employee=emp)
-                emp_completed = emp_tasks.filter(status='completed')
-                emp_on_time = 0
-                for t in emp_completed:
-                    if t.completed_at and t.deadline and t.completed_at.date() <= t.deadline:
-                        emp_on_time += 1
-
-                emp_ratings = ratings.filter(task__employee=emp)
-                emp_total = 0
-                emp_count = 0
-                for r in emp_ratings:
-                    emp_total += r.rating
-                    emp_count += 1
-                emp_avg = round(emp_total / emp_count, 1) if emp_count > 0 else 0
-
-                employee_stats.append({
-                    "id": emp.id,
-                    "username": emp.username,
-                    "full_name": f"{emp.first_name} {emp.last_name}".strip() or emp.username,
-                    "attendance_percent": 0,  
-                    "on_time_percent": round((emp_on_time / emp_completed.count() * 100), 1) if emp_completed.count() > 0 else 0,
-                    "average_rating": emp_avg,
-                    "total_tasks": emp_tasks.count(),
-                    "completed_tasks": emp_completed.count(),
-                })
-
-            result["employees"] = employee_stats
+    def get(self, request):
+        user = request.user
+        today = timezone.now().date()
+        try:
+            end = date.fromisoformat(request.query_params['end']) if 'end' in request.query_params else today
+            start = date.fromisoformat(request.query_params['start']) if 'start' in request.query_params else end - timedelta(days=29)
+            start_time = time.fromisoformat(request.query_params['start_time']) if 'start_time' in request.query_params else None
+        except ValueError:
+            return Response({"detail": "Invalid start, end or start_time."}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(result)
+        attendances = Attendance.objects.filter(date__gte=start, date__lte=end)
+        if user.role == 'supervisor':
+            attendances = attendances.filter(team_supervisor__in=OrgClosure.objects.subtree(user))
 
-class NotificationsView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+        # numpy is only loaded by the two analytics views, not at worker startup
+        from . import analytics
+        result = analytics.attendance_summary(attendances, today, start_time=start_time)
+        usernames = dict(User.objects.filter(
+            id__in={row['id'] for row in result['employees']} | {row['id'] for row in result['teams']}
+        ).values_list('id', 'username'))
+        for row in result['employees'] + result['teams']:
+            row['username'] = usernames.get(row['id'])
+
+        return Response({"start": start, "end": end, **result})
+
+
+class RatingCalibrationView(ConcurrencyLimitMixin, ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrSupervisor]
 
     def get(self, request):
+        from . import calibration
         user = request.user
-        alerts = []
-        today = timezone.now().date()
+        result = calibration.calibration()
+        supervisors, employees = result['supervisors'], result['employees']
+        if user.role == 'supervisor':
+            team = set(User.objects.filter(id__in=OrgClosure.objects.subtree(user)).values_list('id', flat=True))
+            supervisors = [row for row in supervisors if row['id'] in team]
+            employees = [row for row in employees if row['id'] in team and row['id'] != user.id]
+
+        usernames = dict(User.objects.filter(
+            id__in={row['id'] for row in supervisors} | {row['id'] for row in employees}
+        ).values_list('id', 'username'))
+        # copies, the cached result is shared
+        supervisors = [{**row, 'username': usernames.get(row['id'])} for row in supervisors]
+        employees = [{**row, 'username': usernames.get(row['id'])} for row in employees]
+
+        return Response({**result, "supervisors": supervisors, "employees": employees})
 
-        if user.role == 'employee':
-            # deadline reminders (3 days or less)
-            my_tasks = Task.objects.filter(employee=user)
-            unfinished = my_tasks.filter(status__in=['pending', 'in_progress'])
-
-            for task in unfinished:
-                if task.deadline and task.deadline >= today:
-                    days_left = (task.deadline - today).days
-                    if 0 <= days_left <= 3:
-                        alerts.append({
-                            "title": "Task Deadline Approaching",
-                            "message": f"Task '{task.title}' is due in {days_left} day{'s' if days_left != 1 else ''}!",
-                            "task_id": task.id,
-                            "days_left": days_left,
-                            "read": False  
-                        })
 
+class TaskStatusAnalyticsView(ConcurrencyLimitMixin, ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        if user.role == 'employee':
+            stats = TaskStatusStat.objects.filter(employee=user)
         elif user.role == 'supervisor':
-            # pending ratings
-            team_tasks = Task.objects.filter(employee__supervisor=user, status='completed')
-
-            for task in team_tasks:
-                if not task.task_ratings.filter(rated_by=user).exists():
-                    employee_name = task.employee.username
-                    alerts.append({
-                        "title": "Pending Task Rating",
-                        "message": f"Rate task '{task.title}' for {employee_name}",
-                        "task_id": task.id,
-                        "read": False
-                    })
+            stats = TaskStatusStat.objects.filter(employee__in=OrgClosure.objects.below(user))
+        elif user.role == 'admin':
+            stats = TaskStatusStat.objects.all()
+        else:
+            return Response({"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
+
+        return Response({"statuses": status_summary(stats)})
+
+
+class SyncView(ConcurrencyLimitMixin, APIView):
+    # always the primary: replica lag could let a cursor skip past rows
+    permission_classes = [permissions.IsAuthenticated]
+    concurrency_pool = 'sync'
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        page = request.query_params.get('page')
+        try:
+            since = sync.decode_cursor(since) if since else None
+            page = sync.decode_page(page) if page else None
+        except (ValueError, OverflowError):
+            return Response({"detail": "Invalid since cursor or page."}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = sync.changes(request.user, since, page)
+        if result is None:
+            return Response({"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
+        return Response(result)
+
+
+class NotificationsView(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        alerts = cached_alerts(request.user, timezone.now().date())
 
         if request.query_params.get('unread') == 'true':
             return Response({"count": len(alerts)})
@@ -368,9 +585,10 @@ class NotificationsView(APIView):
         return Response({"alerts": alerts})
     
 
-class UserListView(ListCreateAPIView):
+class UserListView(ReplicaReadMixin, ProjectionListMixin, ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    projection = USER_PROJECTION
     permission_classes = [permissions.IsAuthenticated]  
 
     def get_queryset(self):
@@ -378,7 +596,7 @@ class UserListView(ListCreateAPIView):
         if user.role == 'admin': # admins see all employees
             return User.objects.all()
         if user.role == 'supervisor': # supervisors see  employees assigned to them
-            return User.objects.filter(role='employee', supervisor=user)
+            return User.objects.filter(role='employee', id__in=OrgClosure.objects.below(user))
         return User.objects.filter(id=user.id)
     
     def perform_create(self, serializer):
@@ -401,7 +619,7 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView): # admins can also v
             return obj
 
         # supervisor can only access their employees
-        if user.role == 'supervisor' and obj.role == 'employee' and obj.supervisor == user:
+        if user.role == 'supervisor' and obj.role == 'employee' and manages(user, obj.id, obj.supervisor_id):
             return obj
 
         # Employee can only access only themselves
@@ -455,4 +673,26 @@ class BootstrapAdminView(APIView):
             return Response({"detail": str(e)}, status=400)
 
 
+class DatabasePoolStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
 
+    def get(self, request):
+        pools = {}
+        for alias in connections:
+            # only Postgres aliases with DB_POOL=True have a pool
+            pool = getattr(connections[alias], 'pool', None)
+            if pool is None:
+                continue
+            stats = pool.get_stats()
+            requests_num = stats.get('requests_num', 0)
+            stats['avg_wait_ms'] = round(stats.get('requests_wait_ms', 0) / requests_num, 2) if requests_num else 0
+            pools[alias] = stats
+        return Response({"pools": pools})
+
+
+class PasswordHashStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        # figures are for the worker process that answers
+        return Response(hashing.pool.snapshot())
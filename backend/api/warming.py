@@ -0,0 +1,71 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+# Precomputes the supervisor/admin dashboards (report, pending-rating alerts
+# and the default rankings pages) so the first load of the day is a cache
+# hit. Each scope is built in a worker process with its own database
+# connection; the payloads come back to the parent, which writes them to the
+# cache. Only useful with a shared cache (REDIS_URL): with the local-memory
+# fallback the web processes never see what this stores.
+
+
+def _setup():
+    # runs once per worker, which may be a fresh interpreter
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+
+def _build(user_id, today):
+    from .models import User
+    from .reports import dashboard_entries
+
+    try:
+        return dashboard_entries(User.objects.get(pk=user_id), today)
+    finally:
+        connections.close_all()
+
+
+def scopes():
+    from .models import User
+    from .reports import DASHBOARD_ROLES, dashboard_scope
+
+    # every admin shares one scope, so one of them stands in for all
+    users = {}
+    for user in User.objects.filter(role__in=DASHBOARD_ROLES, is_active=True).order_by('id'):
+        users.setdefault(dashboard_scope(user), user.id)
+    return users
+
+
+def warm(processes=None):
+    started = time.monotonic()
+    today = timezone.now().date()
+    targets = scopes()
+    # forked workers must not share the parent's sockets
+    connections.close_all()
+
+    keys, failures = 0, []
+    with ProcessPoolExecutor(max_workers=processes, initializer=_setup) as pool:
+        futures = {pool.submit(_build, user_id, today): scope for scope, user_id in targets.items()}
+        for future in as_completed(futures):
+            try:
+                entries = future.result()
+            except Exception as exc:
+                failures.append((futures[future], repr(exc)))
+                continue
+            for key, payload, timeout in entries:
+                cache.set(key, payload, timeout)
+            keys += len(entries)
+
+    return {
+        "scopes": len(targets),
+        "warmed": len(targets) - len(failures),
+        "keys": keys,
+        "failures": failures,
+        "seconds": round(time.monotonic() - started, 2),
+    }
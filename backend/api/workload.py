@@ -0,0 +1,147 @@
+import heapq
+import itertools
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, IntegerField, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import User
+
+# In-process workload index for picking assignees. Each employee has an open
+# load (open tasks weighted by priority) and their nearest open deadline,
+# seeded for everyone with one grouped query. Task saves/deletes re-aggregate
+# only the employees they touch, after commit. Employees sit in one min-heap
+# per team (their supervisor), ordered least loaded first, then least urgent,
+# so a suggestion pops from the heaps instead of scanning tasks. Outdated heap
+# entries are skipped when they surface.
+#
+# Every process keeps its own copy. A shared version counter in the cache
+# tells a process when another one changed something, and the index is
+# reseeded after WORKLOAD_REFRESH_SECONDS regardless.
+
+PRIORITY_WEIGHTS = {'high': 3, 'medium': 2, 'low': 1}
+OPEN_STATUSES = ('pending', 'in_progress', 'overdue')
+VERSION_KEY = 'workload-version'
+NO_DEADLINE = date.max.toordinal()
+
+
+def _loads(employees):
+    open_tasks = Q(assigned_tasks__status__in=OPEN_STATUSES)
+    weight = Case(
+        *[When(assigned_tasks__priority=priority, then=Value(w)) for priority, w in PRIORITY_WEIGHTS.items()],
+        default=Value(PRIORITY_WEIGHTS['medium']),
+        output_field=IntegerField(),
+    )
+    return employees.filter(role='employee').order_by().annotate(
+        load=Coalesce(Sum(weight, filter=open_tasks), 0),
+        nearest=Min('assigned_tasks__deadline', filter=open_tasks),
+    ).values_list('id', 'supervisor_id', 'load', 'nearest')
+
+
+class WorkloadIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seen_version = None
+        self.seeded_at = None
+        self.employees = {}
+        self.heaps = {}
+        # never reused, so an entry left over from before a removal can't match again
+        self.stamps = itertools.count()
+
+    def _push(self, employee_id, team_id, load, nearest):
+        stamp = next(self.stamps)
+        self.employees[employee_id] = (team_id, load, nearest, stamp)
+        # least loaded first; on a tie the one whose nearest deadline is furthest away
+        urgency = -(nearest.toordinal() if nearest else NO_DEADLINE)
+        heapq.heappush(self.heaps.setdefault(team_id, []), (load, urgency, employee_id, stamp))
+
+    def _current(self, entry):
+        state = self.employees.get(entry[2])
+        return state is not None and state[3] == entry[3]
+
+    def _seed(self):
+        self.employees, self.heaps = {}, {}
+        for employee_id, team_id, load, nearest in _loads(User.objects.all()):
+            self._push(employee_id, team_id, load, nearest)
+        self.seeded_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        version = cache.get(VERSION_KEY)
+        stale = self.seeded_at is None or time.monotonic() - self.seeded_at > settings.WORKLOAD_REFRESH_SECONDS
+        if stale or version != self.seen_version:
+            self.seen_version = version
+            self._seed()
+
+    def _bump(self):
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            version = 1 if cache.add(VERSION_KEY, 1, None) else cache.incr(VERSION_KEY)
+        # only trust the local copy if no other process changed anything meanwhile
+        if self.seen_version is not None and version == self.seen_version + 1:
+            self.seen_version = version
+        else:
+            self.seen_version = None
+
+    def task_changed(self, *employee_ids):
+        # the ids ride on this write's own on_commit, so another thread's
+        # commit can't re-aggregate them before this one is visible
+        employee_ids = {i for i in employee_ids if i is not None}
+        if employee_ids:
+            transaction.on_commit(lambda: self.flush(employee_ids))
+
+    def team_changed(self):
+        # membership moved; reseed on next use everywhere
+        with self.lock:
+            self.seeded_at = None
+        transaction.on_commit(self._bump_after_reset)
+
+    def _bump_after_reset(self):
+        with self.lock:
+            self._bump()
+
+    def flush(self, employee_ids):
+        with self.lock:
+            if self.seeded_at is None:
+                self._bump()
+                return
+            found = set()
+            for employee_id, team_id, load, nearest in _loads(User.objects.filter(id__in=employee_ids)):
+                found.add(employee_id)
+                self._push(employee_id, team_id, load, nearest)
+            for employee_id in employee_ids - found:
+                self.employees.pop(employee_id, None)
+            self._bump()
+
+    def suggest(self, team_ids=None, limit=1):
+        with self.lock:
+            self._ensure_fresh()
+            heaps = self.heaps if team_ids is None else {t: self.heaps[t] for t in team_ids if t in self.heaps}
+            candidates = []
+            for heap in heaps.values():
+                # take this team's best `limit` entries, then put them back
+                taken = []
+                while heap and len(taken) < limit:
+                    entry = heapq.heappop(heap)
+                    if self._current(entry):
+                        taken.append(entry)
+                for entry in taken:
+                    heapq.heappush(heap, entry)
+                candidates.extend(taken)
+            best = heapq.nsmallest(limit, candidates)
+            return [
+                {
+                    "id": employee_id,
+                    "open_load": load,
+                    "nearest_deadline": self.employees[employee_id][2],
+                }
+                for load, _, employee_id, _ in best
+            ]
+
+
+index = WorkloadIndex()
@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 import dj_database_url
 from pathlib import Path
+from datetime import time
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -56,12 +57,15 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.routers.ReadYourWritesMiddleware',
+    'api.idempotency.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -87,14 +91,53 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# DB_POOL=True switches Postgres to psycopg's native pool: connections (and
+# their SSL handshakes) are shared across threads instead of opened per
+# worker thread. Otherwise connections persist per thread for 600s.
+# Either way connections are health-checked before reuse.
+DB_POOL = os.environ.get("DB_POOL") == "True"
+
+
+def database_config(config):
+    if DB_POOL and config.get("ENGINE") == "django.db.backends.postgresql":
+        config["CONN_MAX_AGE"] = 0  # the pool owns connection lifetime
+        config.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+            "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", 600)),
+        }
+    return config
+
+
 DATABASES = {
-    "default": dj_database_url.config(
+    "default": database_config(dj_database_url.config(
         default=os.environ.get("DATABASE_URL"),
         conn_max_age=600,
+        conn_health_checks=True,
         ssl_require=not DEBUG,  # SSL only in production
-    )
+    ))
 }
 
+# Read replicas: every DATABASE_URL_<NAME> env var adds a replica alias <name>.
+# Safe-method reads in report/list views go to a replica unless the user
+# wrote something within the last REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+for env_name, env_url in sorted(os.environ.items()):
+    if env_name.startswith("DATABASE_URL_") and env_url:
+        alias = env_name[len("DATABASE_URL_"):].lower()
+        DATABASES[alias] = database_config(dj_database_url.parse(
+            env_url,
+            conn_max_age=600,
+            conn_health_checks=True,
+            ssl_require=not DEBUG,
+        ))
+        DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+        DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
+
 
 # DATABASES = {
 #    'default': {
@@ -107,6 +150,22 @@ DATABASES = {
 #    }
 # }
 
+# Shared cache for rankings, report payloads and read-your-writes pins.
+# Set REDIS_URL in production so every worker sees the same entries.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 CORS_ALLOW_CREDENTIALS = True
 
 CORS_ALLOWED_ORIGINS = [
@@ -119,6 +178,11 @@ CORS_ALLOW_HEADERS = [
     "authorization",
     "content-type",
     "x-csrftoken",
+    "idempotency-key",
+]
+
+CORS_EXPOSE_HEADERS = [
+    "idempotent-replayed",
 ]
 
 CORS_ALLOW_METHODS = [
@@ -135,9 +199,29 @@ CSRF_TRUSTED_ORIGINS = [
     "https://performance-management-platform.vercel.app",
 ]
 
+# JSON/text responses at least this many bytes are brotli/gzip compressed
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
+# PASSWORD_HASHER picks the hasher for new passwords: pbkdf2 (default), scrypt,
+# or argon2 (needs the argon2-cffi package). Hashes made by the others still
+# verify and are upgraded on the user's next login.
+PASSWORD_HASHER_CLASSES = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[os.environ.get("PASSWORD_HASHER", "pbkdf2")]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CLASSES.items() if name != os.environ.get("PASSWORD_HASHER", "pbkdf2")
+] + ["django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher"]
+# hashing pool per worker process (api/hashing.py): threads, extra hashes
+# allowed to wait, and how long a request waits for room before a 503
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 4))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -173,8 +257,35 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.WriteUserThrottle',
+    ),
+    # proxies in front of the app, so throttles key on the client's own IP
+    'NUM_PROXIES': int(os.environ["THROTTLE_NUM_PROXIES"]) if os.environ.get("THROTTLE_NUM_PROXIES") else None,
 }
 
+# Token buckets (api/throttling.py): scope -> (burst, tokens refilled per second)
+THROTTLE_BUCKETS = {
+    'login_ip': (20, 20 / 60),
+    'login_user': (5, 5 / 300),
+    'register_ip': (5, 5 / 3600),
+    'write_user': (60, 2),
+}
+# Expensive read endpoints share this many slots per pool across all workers; a
+# request waits up to CONCURRENCY_QUEUE_TIMEOUT seconds for one before getting a
+# 503. Delta sync has its own pool so slow reports can't starve routine syncs
+CONCURRENCY_LIMITS = {
+    'reports': int(os.environ.get("CONCURRENCY_LIMIT_REPORTS", 4)),
+    'sync': int(os.environ.get("CONCURRENCY_LIMIT_SYNC", 8)),
+}
+CONCURRENCY_QUEUE_TIMEOUT = float(os.environ.get("CONCURRENCY_QUEUE_TIMEOUT", 2))
+# a slot is freed after this long even if its worker died holding it
+CONCURRENCY_SLOT_TTL = int(os.environ.get("CONCURRENCY_SLOT_TTL", 120))
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -188,3 +299,50 @@ BOOTSTRAP_ADMIN_TOKEN = os.environ.get(
 )
 
 AUTH_USER_MODEL = 'api.User'
+
+# Idempotency-Key replay: responses are kept this long; a duplicate waits up to
+# IDEMPOTENCY_WAIT seconds for the original before getting a 409. Needs a
+# shared cache (REDIS_URL) when running more than one process
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", 60 * 60 * 24))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", 60))
+IDEMPOTENCY_WAIT = float(os.environ.get("IDEMPOTENCY_WAIT", 10))
+
+# GET /api/sync/: cursors trail the clock by SYNC_COMMIT_LAG so slow
+# transactions aren't skipped; deletions are remembered for SYNC_TOMBSTONE_DAYS;
+# a response carries at most SYNC_PAGE_SIZE rows and ids, the rest follow via `next`
+SYNC_COMMIT_LAG = timedelta(seconds=int(os.environ.get("SYNC_COMMIT_LAG_SECONDS", 10)))
+SYNC_TOMBSTONE_DAYS = int(os.environ.get("SYNC_TOMBSTONE_DAYS", 30))
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", 1000))
+
+# each process reseeds its task workload index at least this often
+WORKLOAD_REFRESH_SECONDS = int(os.environ.get("WORKLOAD_REFRESH_SECONDS", 300))
+
+# supervisor/admin report and alerts stay cached this long; refreshed by
+# `manage.py warm_dashboard_cache`
+DASHBOARD_CACHE_SECONDS = int(os.environ.get("DASHBOARD_CACHE_SECONDS", 900))
+
+# admin changelists count exactly up to this many rows, then use the planner's estimate
+ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get("ADMIN_EXACT_COUNT_LIMIT", 10000))
+
+# Write-behind attendance: clock-in/out are journaled locally and applied by
+# `manage.py drain_attendance_queue`
+ATTENDANCE_WRITE_BEHIND = os.environ.get("ATTENDANCE_WRITE_BEHIND") == "True"
+ATTENDANCE_JOURNAL_PATH = os.environ.get(
+    "ATTENDANCE_JOURNAL_PATH",
+    BASE_DIR / 'attendance_journal.sqlite3'
+)
+
+# Attendance analytics: arrivals after start time + grace count as late,
+# hours beyond the standard day count as overtime (times are UTC)
+ATTENDANCE_START_TIME = time.fromisoformat(os.environ.get("ATTENDANCE_START_TIME", "09:00"))
+ATTENDANCE_LATE_GRACE_MINUTES = int(os.environ.get("ATTENDANCE_LATE_GRACE_MINUTES", 5))
+ATTENDANCE_STANDARD_HOURS = float(os.environ.get("ATTENDANCE_STANDARD_HOURS", 8))
+
+# Optional monthly partitioning of the attendance table (Postgres), see
+# `manage.py attendance_partitions`: partitions are created this many months
+# ahead and detached once older than the retention (0 keeps everything)
+ATTENDANCE_PARTITION_MONTHS_AHEAD = int(os.environ.get("ATTENDANCE_PARTITION_MONTHS_AHEAD", 3))
+ATTENDANCE_PARTITION_RETAIN_MONTHS = int(os.environ.get("ATTENDANCE_PARTITION_RETAIN_MONTHS", 0))
+ATTENDANCE_ARCHIVE_SCHEMA = os.environ.get("ATTENDANCE_ARCHIVE_SCHEMA", "attendance_archive")
+# reports count attendance over the last N days (0: all history)
+ATTENDANCE_REPORT_DAYS = int(os.environ.get("ATTENDANCE_REPORT_DAYS", 0))
@@ -0,0 +1,37 @@
+# Lean profile for worker processes that serve only the JSON API:
+#
+#   DJANGO_SETTINGS_MODULE=core.settings_api gunicorn core.wsgi
+#
+# Clients authenticate with JWTs, so sessions, CSRF, messages, templates, the
+# browsable API, DRF's token auth and the admin (with its static files) are
+# never used there; leaving them out saves their imports at startup, memory
+# in every worker and five middleware calls per request. Run the admin from a
+# separate process on core.settings. `manage.py bench_startup` compares the two.
+from .settings import *  # noqa: F401,F403
+
+UNUSED_APPS = (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'rest_framework.authtoken',
+)
+UNUSED_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    # request.user comes from JWTAuthentication, not the session
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in UNUSED_APPS]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in UNUSED_MIDDLEWARE]
+
+ROOT_URLCONF = 'core.urls_api'
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ('api.renderers.ORJSONRenderer',),
+}
@@ -0,0 +1,6 @@
+from django.urls import path, include
+
+# core.urls without the admin, for core.settings_api
+urlpatterns = [
+    path('api/', include('api.urls')),
+]
@@ -0,0 +1,16 @@
+import os
+
+# Threaded workers, so a request hashing a password (api/hashing.py) only
+# holds its own thread. Each process hashes at most
+# PASSWORD_HASH_WORKERS passwords at once and lets PASSWORD_HASH_QUEUE more
+# wait; anything beyond that gets a 503. Threads are sized above those slots,
+# so even a login storm that fills them leaves GUNICORN_SPARE_THREADS threads
+# per process serving everything else. The number of processes comes from
+# WEB_CONCURRENCY as usual.
+worker_class = 'gthread'
+
+hash_slots = (
+    int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+    + int(os.environ.get("PASSWORD_HASH_QUEUE", 4))
+)
+threads = int(os.environ.get("GUNICORN_THREADS", hash_slots + int(os.environ.get("GUNICORN_SPARE_THREADS", 4))))